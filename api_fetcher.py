@@ -0,0 +1,207 @@
+import os
+import json
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import HTTP_REQUESTS, HTTP_RETRIES, ROWS, BYTES_WRITTEN
+from raw_store import append_jsonl, iter_jsonl, open_raw
+
+RAW_DIR = "data/raw"
+
+
+class TokenBucket:
+    """Limiteur de débit partagé entre les threads (token bucket)."""
+
+    def __init__(self, rate=1.0, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # 429: on bloque tout le monde pendant Retry-After et on vide le seau
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class PageFetcher:
+    """Moteur de pagination commun: une Session poolée, N pages en parallèle, reprise sur checkpoint."""
+
+    def __init__(self, base_url, headers=None, max_workers=4, rate=1.0, burst=None,
+                 max_retries=5, backoff=1.0, timeout=30, checkpoint_dir=RAW_DIR):
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max(1, int(max_workers))
+        self.bucket = TokenBucket(rate=rate, capacity=burst or self.max_workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.checkpoint_dir = checkpoint_dir
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- checkpoint ----
+    def _checkpoint_path(self, name):
+        return os.path.join(self.checkpoint_dir, f".{name}.checkpoint.json")
+
+    def _load_checkpoint(self, name, key, start_page=1):
+        path = self._checkpoint_path(name)
+        if not os.path.exists(path):
+            return start_page, None
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return start_page, None
+        if state.get("key") != key:
+            return start_page, None
+        print(f"↩️ Resuming {name} from page {state['next_page']} ({state['count']} rows already fetched)")
+        return state["next_page"], state["count"]
+
+    def _save_checkpoint(self, name, key, next_page, count):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(name)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": key, "next_page": next_page, "count": count}, f)
+        os.replace(tmp, path)
+
+    def _clear_checkpoint(self, name):
+        try:
+            os.remove(self._checkpoint_path(name))
+        except FileNotFoundError:
+            pass
+
+    # ---- HTTP ----
+    def get_page(self, endpoint, params, page):
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        query = dict(params, page=page)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, params=query, timeout=self.timeout)
+                HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+                # les 429 comptent dans max_retries; au-delà, raise_for_status abandonne
+                if response.status_code == 429 and attempt < self.max_retries:
+                    attempt += 1
+                    retry_after = _retry_after(response, default=self.backoff * 2 ** (attempt - 1))
+                    print(f"⏳ Rate limited on {endpoint} page {page}. Waiting {retry_after}s...")
+                    HTTP_RETRIES.inc(endpoint=endpoint, reason="429")
+                    self.bucket.pause(retry_after)
+                    continue
+                response.raise_for_status()
+                return response.json().get("data", [])
+            except (requests.RequestException, ValueError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                HTTP_RETRIES.inc(endpoint=endpoint, reason=str(status) if status else type(e).__name__)
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"⚠️ Error on {endpoint} page {page}: {e}. Retrying in {delay}s...")
+                time.sleep(delay)
+
+    def fetch_to(self, path, endpoint, params=None, per_page=100, max_items=200, name=None, start_page=1):
+        """Ajoute au fil de l'eau jusqu'à max_items lignes de `endpoint` dans le JSONL `path`.
+
+        Les pages partent en parallèle mais sont écrites dans l'ordre; le checkpoint ne garde
+        que le curseur, le fichier `path` servant de stockage durable. Retourne le nombre de lignes.
+        """
+        params = dict(params or {}, per_page=per_page)
+        name = name or endpoint.strip("/").replace("/", "_")
+        key = json.dumps({"endpoint": endpoint, "params": params, "max_items": max_items,
+                          "start_page": start_page, "path": path}, sort_keys=True)
+        last_page = start_page - 1 + math.ceil(max_items / per_page)
+
+        next_page, count = self._load_checkpoint(name, key, start_page)
+        if count is None:
+            # nouveau départ: on repart d'un fichier vide
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open_raw(path, "w").close()
+            count = 0
+        initial_rows, initial_size = count, os.path.getsize(path)
+        done = False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while not done and next_page <= last_page and count < max_items:
+                window = range(next_page, min(next_page + self.max_workers, last_page + 1))
+                futures = [pool.submit(self.get_page, endpoint, params, p) for p in window]
+                # on consomme dans l'ordre pour garder un curseur contigu
+                try:
+                    for page, fut in zip(window, futures):
+                        batch = fut.result()
+                        if not batch:
+                            done = True
+                            break
+                        append_jsonl(path, batch[:max_items - count])
+                        count += min(len(batch), max_items - count)
+                        next_page = page + 1
+                        if len(batch) < per_page:
+                            done = True
+                            break
+                finally:
+                    self._save_checkpoint(name, key, next_page, count)
+                print(f"✅ Collected {count} rows from {endpoint} so far")
+
+        self._clear_checkpoint(name)
+        ROWS.inc(count - initial_rows, step="extract_api", kind=endpoint, direction="out")
+        BYTES_WRITTEN.inc(os.path.getsize(path) - initial_size, target="raw")
+        return count
+
+    def fetch(self, endpoint, params=None, per_page=100, max_items=200, name=None, start_page=1):
+        """Comme fetch_to mais retourne la liste (spool temporaire dans checkpoint_dir)."""
+        name = name or endpoint.strip("/").replace("/", "_")
+        spool = os.path.join(self.checkpoint_dir, f".{name}.partial.jsonl")
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.fetch_to(spool, endpoint, params=params, per_page=per_page, max_items=max_items,
+                      name=name, start_page=start_page)
+        items = list(iter_jsonl(spool))
+        os.remove(spool)
+        return items
+
+
+def _retry_after(response, default):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
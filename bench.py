@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Suite de benchmarks reproductible sur données synthétiques (fake_data.py), résultats en JSON.
+
+Chaque résultat porte le commit git: comparer deux fichiers montre les régressions.
+
+    python bench.py --players 5000 --games 200000 --out bench-results.json
+    python bench.py --only transform,load_mongo --mongo mock --compare bench-results.json
+
+- extract: PageFetcher contre le faux serveur (mock_api.py) avec latence, 429 et 5xx injectés;
+- big: génération puis agrégation du flux d'événements (extract_big.py), en événements/s;
+- transform: run_transform sur les fichiers bruts générés;
+- load_postgres: chargement de la couche curated puis re-chargement à l'identique
+  (DATABASE_URL requis; ATTENTION: vide teams/players/games/seasons);
+- load_mongo: idem sur MONGO_URI, ou en mémoire avec --mongo mock (mongomock: ses upserts
+  parcourent toute la collection, n'utiliser qu'à petite taille et pour comparer des commits);
+- endpoints: /players et /games via TestClient, cache vidé (cold) ou non (warm).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import platform
+import subprocess
+import tempfile
+
+BENCHES = ["extract", "big", "transform", "load_postgres", "load_mongo", "endpoints"]
+ENDPOINTS = ["/players?size=50", "/players?size=50&q=jam", "/games?size=50&count=none",
+             "/games?size=50&count=none&expand=teams",
+             "/games?season=2023&size=50", "/games?team_id=14&size=50&count=estimate"]
+
+
+class Skip(Exception):
+    pass
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, round(time.perf_counter() - start, 4)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+def git_commit(repo):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_extract(args):
+    from api_fetcher import PageFetcher
+    from metrics import HTTP_RETRIES
+    from mock_api import MockBalldontlie
+
+    results = {}
+    with MockBalldontlie(players=args.players, games=0, seed=args.seed, latency=args.latency,
+                         p429=args.p429, p5xx=args.p5xx, retry_after=0) as mock:
+        for workers in (1, args.workers):
+            retries = sum(HTTP_RETRIES.samples.values())
+            with PageFetcher(mock.base_url, max_workers=workers, rate=1000, backoff=0.01,
+                             checkpoint_dir="data/raw") as fetcher:
+                rows, seconds = timed(fetcher.fetch_to, "data/raw/bench_players.jsonl", "players",
+                                      per_page=100, max_items=args.players, name="bench_players")
+            results[f"workers_{workers}"] = {"fetch_s": seconds, "rows": rows, "rows_per_s": round(rows / seconds),
+                                             "retries": sum(HTTP_RETRIES.samples.values()) - retries}
+        results["server"] = dict(mock.stats)
+    return results
+
+
+def bench_big(args):
+    from extract_big import run_big, aggregate_big
+
+    _, generate_s = timed(run_big, args.events, seed=args.seed)
+    result, aggregate_s = timed(aggregate_big)
+    return {"generate_s": generate_s, "aggregate_s": aggregate_s, "events": args.events,
+            "aggregates": result["rows"]["aggregates"], "generate_events_per_s": round(args.events / generate_s),
+            "aggregate_events_per_s": round(args.events / aggregate_s)}
+
+
+def bench_transform(args):
+    from fake_data import write_raw
+    from transform import run_transform
+
+    _, generate_s = timed(write_raw, "data/raw", args.players, args.games, seed=args.seed, compress=args.gzip)
+    rows, transform_s = timed(run_transform)
+    total = rows["players"] + rows["games"]
+    return {"generate_s": generate_s, "transform_s": transform_s, "rows": rows,
+            "rows_per_s": round(total / transform_s)}
+
+
+def _curated(args):
+    from transform import read_curated, CURATED_DIR
+    if not os.path.exists(os.path.join(CURATED_DIR, "teams.parquet")):
+        bench_transform(args)
+    return {kind: read_curated(kind) for kind in ("teams", "players", "games")}
+
+
+def _require_postgres():
+    if not os.getenv("DATABASE_URL"):
+        raise Skip("DATABASE_URL not set")
+
+
+def bench_load_postgres(args):
+    _require_postgres()
+    from sqlalchemy import text
+    from load_pg import load_postgres
+    from models import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as sess:
+        sess.execute(text("TRUNCATE games, players, teams, seasons CASCADE"))
+        sess.commit()
+    tables = _curated(args)
+    _, load_s = timed(load_postgres, tables["players"], tables["games"], tables["teams"])
+    # second passage: rien n'a changé, l'upsert ne réécrit rien
+    _, reload_s = timed(load_postgres, tables["players"], tables["games"], tables["teams"])
+    rows = sum(t.num_rows for t in tables.values())
+    return {"load_s": load_s, "reload_unchanged_s": reload_s, "rows": rows, "rows_per_s": round(rows / load_s)}
+
+
+def bench_load_mongo(args):
+    if args.mongo == "mock":
+        try:
+            import mongomock
+        except ImportError:
+            raise Skip("mongomock not installed")
+        import load_mongo
+        load_mongo.mdb = mongomock.MongoClient()["nba"]
+    else:
+        if not (os.getenv("MONGODB_URI") or os.getenv("MONGO_URI")):
+            raise Skip("MONGO_URI not set")
+        import load_mongo
+    mdb = load_mongo.get_db()
+    mdb.players.drop()
+    mdb.games.drop()
+
+    tables = _curated(args)
+    _, load_s = timed(load_mongo.load_mongo, tables["players"], tables["games"])
+    _, reload_s = timed(load_mongo.load_mongo, tables["players"], tables["games"])
+    rows = tables["players"].num_rows + tables["games"].num_rows
+    return {"backend": args.mongo, "load_s": load_s, "reload_unchanged_s": reload_s, "rows": rows,
+            "rows_per_s": round(rows / load_s)}
+
+
+def bench_endpoints(args):
+    _require_postgres()
+    from fastapi.testclient import TestClient
+    from cache import get_response_cache
+    import main
+
+    headers = {"X-API-Key": main.PUBLIC_API_KEY} if main.PUBLIC_API_KEY else {}
+    results = {}
+    with TestClient(main.app) as client:
+        for path in ENDPOINTS:
+            cold, warm = [], []
+            for _ in range(args.requests):
+                get_response_cache().invalidate()
+                response, elapsed = timed(client.get, path, headers=headers)
+                response.raise_for_status()
+                cold.append(elapsed)
+                _, elapsed = timed(client.get, path, headers=headers)
+                warm.append(elapsed)
+            results[path] = {
+                "cold_p50_ms": round(percentile(cold, 50) * 1000, 2),
+                "cold_p95_ms": round(percentile(cold, 95) * 1000, 2),
+                "warm_p50_ms": round(percentile(warm, 50) * 1000, 2),
+            }
+    return results
+
+
+def compare(results, previous):
+    """Rapport nouveau / ancien pour chaque durée (> 1: plus lent)."""
+    ratios = {}
+    for name, new in results.items():
+        old = previous.get("results", {}).get(name, {})
+        for key, value in new.items():
+            if key.endswith("_s") and isinstance(old.get(key), (int, float)) and old[key] > 0:
+                ratios[f"{name}.{key}"] = round(value / old[key], 2)
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=1_000_000, help="événements du flux big data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gzip", action="store_true", help="fichiers bruts en .jsonl.gz")
+    parser.add_argument("--requests", type=int, default=20, help="requêtes par endpoint")
+    parser.add_argument("--workers", type=int, default=8, help="pages en parallèle (extract)")
+    parser.add_argument("--latency", type=float, default=0.02, help="latence du faux serveur (extract)")
+    parser.add_argument("--p429", type=float, default=0.02)
+    parser.add_argument("--p5xx", type=float, default=0.01)
+    parser.add_argument("--mongo", choices=["uri", "mock"], default="uri")
+    parser.add_argument("--only", default=",".join(BENCHES))
+    parser.add_argument("--out", help="fichier JSON de résultats")
+    parser.add_argument("--compare", help="résultats précédents à comparer")
+    args = parser.parse_args(argv)
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    report = {
+        "commit": git_commit(repo), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+        "params": {"players": args.players, "games": args.games, "events": args.events, "seed": args.seed, "gzip": args.gzip,
+                   "requests": args.requests, "workers": args.workers, "latency": args.latency,
+                   "p429": args.p429, "p5xx": args.p5xx},
+        "results": {},
+    }
+
+    # le pipeline travaille en chemins relatifs (data/raw, data/curated): espace de travail jetable
+    cwd = os.getcwd()
+    out = os.path.abspath(args.out) if args.out else None
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        sys.path.insert(0, repo)
+        try:
+            for name in args.only.split(","):
+                bench = globals()[f"bench_{name}"]
+                try:
+                    # les modules du pipeline affichent leur progression: stdout reste réservé au JSON
+                    with contextlib.redirect_stdout(sys.stderr):
+                        report["results"][name] = bench(args)
+                except Skip as e:
+                    report["results"][name] = {"skipped": str(e)}
+                print(f"⏱️ {name}: {json.dumps(report['results'][name])}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    if previous is not None:
+        report["compare"] = {"commit": previous.get("commit"), "ratios": compare(report["results"], previous)}
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Benchmark du chargement PostgreSQL: INSERT ... VALUES par lots vs COPY + staging + upsert.
+
+Attention: vide les tables teams/players/games/seasons de DATABASE_URL.
+
+    python bench_load_pg.py --games 100000
+"""
+import json
+import time
+import argparse
+
+from sqlalchemy import text
+
+from fake_data import fake_games
+from load_pg import load_postgres
+from models import SessionLocal, init_db
+
+
+def reset():
+    with SessionLocal() as sess:
+        sess.execute(text("TRUNCATE games, players, teams, seasons CASCADE"))
+        sess.commit()
+
+
+def timed(mode, games, chunk_size):
+    start = time.perf_counter()
+    load_postgres([], games, mode=mode, chunk_size=chunk_size)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    init_db()
+    games = list(fake_games(args.games))
+    results = {"games": args.games, "chunk_size": args.chunk_size}
+
+    reset()
+    results["insert_s"] = timed("insert", games, args.chunk_size)
+    reset()
+    results["copy_s"] = timed("copy", games, args.chunk_size)
+    # second passage: rien n'a changé, l'upsert ne doit rien réécrire
+    results["copy_rerun_s"] = timed("copy", games, args.chunk_size)
+    results["speedup"] = round(results["insert_s"] / results["copy_s"], 1)
+    reset()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Benchmark: ancien transform (read_json -> to_dict -> json_normalize) vs normaliseur Arrow.
+
+    python bench_transform.py --games 1000000
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+from fake_data import fake_games, write_jsonl
+from transform import iter_normalized, normalize_games, RAW_GAME_SCHEMA
+
+
+def write_games(path, n, seed=42):
+    write_jsonl(path, fake_games(n, seed))
+
+
+def legacy(path):
+    games = pd.read_json(path, lines=True)
+    games_norm = pd.json_normalize(games.to_dict(orient="records"))
+    games_norm = games_norm.drop_duplicates(subset=["id"])
+    games_out = games_norm.rename(columns={
+        "home_team.id": "home_team_id",
+        "visitor_team.id": "visitor_team_id",
+        "home_team_score": "home_score",
+        "visitor_team_score": "visitor_score"
+    })
+    keep = ["id", "season", "date", "home_team_id", "visitor_team_id", "home_score", "visitor_score"]
+    return len(games_out[keep])
+
+
+def vectorized(path):
+    return sum(t.num_rows for t in iter_normalized(path, normalize_games, RAW_GAME_SCHEMA))
+
+
+def timed(fn, path):
+    start = time.perf_counter()
+    rows = fn(path)
+    return rows, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "api_games.jsonl")
+        write_games(path, args.games)
+        results = {"games": args.games}
+        rows, results["vectorized_s"] = timed(vectorized, path)
+        assert rows == args.games
+        if not args.skip_legacy:
+            rows, results["legacy_s"] = timed(legacy, path)
+            assert rows == args.games
+            results["speedup"] = round(results["legacy_s"] / results["vectorized_s"], 1)
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,272 @@
+# cache.py
+"""Cache de réponses de l'API, invalidé par l'ETL.
+
+Deux backends:
+- "memory": TTL + LRU borné en taille, propre à chaque processus;
+- "sqlite": fichier partagé par tous les workers uvicorn d'une machine. La version
+  des données y est stockée: un chargement l'incrémente et tous les workers
+  ignorent aussitôt les anciennes entrées. Ses appels sont bloquants (`blocking`):
+  l'API les exécute hors de la boucle asyncio.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "data/cache.sqlite3")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 << 20)))
+# sqlite: dates de lecture (LRU) gardées en mémoire et écrites par lot au plus toutes les N secondes
+CACHE_TOUCH_INTERVAL = float(os.getenv("CACHE_TOUCH_INTERVAL", "5"))
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+
+
+class ResponseCache:
+    """Backend "memory": OrderedDict LRU avec TTL, borné en nombre d'entrées et en octets."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[1] < time.monotonic():
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, body, version=None):
+        """Stocke `body` (bytes); ignoré si les données ont été rechargées depuis `version`."""
+        entry = CacheEntry(body)
+        if len(body) > self.max_bytes:
+            return entry
+        with self.lock:
+            if version is not None and version != self._version:
+                return entry
+            if key in self.entries:
+                self._pop(key)
+            self.entries[key] = (entry, time.monotonic() + self.ttl)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+        return entry
+
+    def invalidate(self):
+        """Appelé après un chargement: vide le cache et change de version."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self._version += 1
+
+    def stats(self):
+        with self.lock:
+            return {"backend": self.name, "version": self._version, "entries": len(self.entries),
+                    "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+    def _pop(self, key):
+        entry, _ = self.entries.pop(key)
+        self.size -= len(entry.body)
+
+
+class SQLiteCache:
+    """Backend "sqlite": entrées et version partagées entre processus via un fichier SQLite (WAL).
+
+    Une lecture ne fait pas d'écriture: la date de lecture (LRU) part par lot toutes les
+    `touch_interval` secondes. Des triggers tiennent à jour le nombre d'entrées et d'octets
+    (cache_totals): vérifier les bornes après un set ne parcourt pas la table.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 touch_interval=CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.touched = {}
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO cache_meta (id, version) VALUES (0, 0)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY, version INTEGER NOT NULL, body BLOB NOT NULL,
+                etag TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)
+        """)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""CREATE TABLE IF NOT EXISTS cache_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)""")
+            conn.execute("""INSERT OR IGNORE INTO cache_totals (id, entries, bytes)
+                SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM cache_entries""")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+                UPDATE cache_totals SET entries = entries + 1, bytes = bytes + LENGTH(NEW.body) WHERE id = 0; END""")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+                UPDATE cache_totals SET entries = entries - 1, bytes = bytes - LENGTH(OLD.body) WHERE id = 0; END""")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # INSERT OR REPLACE déclenche alors le trigger de suppression (cache_totals exact)
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self.local.conn = conn
+        return conn
+
+    @property
+    def version(self):
+        return self._conn().execute("SELECT version FROM cache_meta WHERE id = 0").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        # la jointure sur cache_meta écarte les entrées d'une version précédente
+        row = conn.execute("""
+            SELECT e.body, e.etag FROM cache_entries e JOIN cache_meta m ON m.id = 0 AND e.version = m.version
+            WHERE e.key = ? AND e.expires > ?
+        """, (key, now)).fetchone()
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched[key] = now
+            due = time.monotonic() - self.touched_at >= self.touch_interval
+        if due:
+            self._flush_touched(conn)
+        return CacheEntry(bytes(row[0]), row[1])
+
+    def _flush_touched(self, conn):
+        """Écrit en une transaction les dates de lecture accumulées depuis le dernier lot."""
+        with self.lock:
+            touched, self.touched = self.touched, {}
+            self.touched_at = time.monotonic()
+        if not touched:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE cache_entries SET accessed = MAX(accessed, ?) WHERE key = ?",
+                             [(at, key) for key, at in touched.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def set(self, key, body, version=None):
+        entry = CacheEntry(body)
+        if len(body) > self.max_bytes:
+            return entry
+        now = time.time()
+        conn = self._conn()
+        conn.execute("""
+            INSERT OR REPLACE INTO cache_entries (key, version, body, etag, expires, accessed)
+            SELECT ?, version, ?, ?, ?, ? FROM cache_meta WHERE id = 0 AND (? IS NULL OR version = ?)
+        """, (key, body, entry.etag, now + self.ttl, now, version, version))
+        self._evict(conn)
+        return entry
+
+    def _evict(self, conn):
+        count, size = conn.execute("SELECT entries, bytes FROM cache_totals WHERE id = 0").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        self._flush_touched(conn)
+        conn.execute("DELETE FROM cache_entries WHERE expires <= ?", (time.time(),))
+        # LRU: on retire les entrées les moins récemment lues jusqu'à repasser sous les bornes
+        rows = conn.execute("SELECT key, LENGTH(body) FROM cache_entries ORDER BY accessed, rowid").fetchall()
+        count, size = len(rows), sum(r[1] for r in rows)
+        stale = []
+        for key, length in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            size -= length
+        conn.executemany("DELETE FROM cache_entries WHERE key = ?", stale)
+
+    def invalidate(self):
+        """Incrémente la version partagée: tous les workers abandonnent leurs entrées en même temps."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE cache_meta SET version = version + 1 WHERE id = 0")
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self):
+        count, size = self._conn().execute("SELECT entries, bytes FROM cache_totals WHERE id = 0").fetchone()
+        return {"backend": self.name, "version": self.version, "entries": count,
+                "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+def make_cache(backend=CACHE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteCache()
+    if backend == "memory":
+        return ResponseCache()
+    raise ValueError(f"❌ Unknown CACHE_BACKEND: {backend}")
+
+
+# créé au premier usage: importer cache.py (ou main.py) n'ouvre aucun fichier SQLite
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = make_cache()
+    return _response_cache
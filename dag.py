@@ -0,0 +1,244 @@
+# dag.py
+"""Petit ordonnanceur de graphe d'étapes (DAG) pour le pipeline ETL.
+
+Chaque étape démarre dès que ses dépendances ont réussi; les étapes indépendantes
+tournent en parallèle (max_workers). Par étape: tentatives (retries + backoff),
+timeout, et saut si l'empreinte de ses fichiers d'entrée n'a pas changé depuis
+le dernier succès (état dans DAG_STATE_PATH).
+
+executor="process": chaque tentative tourne dans un processus dédié (pas de GIL
+partagé, et un timeout termine réellement l'étape). executor="thread": la tentative
+dépassant son timeout est abandonnée mais son thread n'est pas interrompu.
+"""
+import os
+import gzip
+import json
+import time
+import queue
+import hashlib
+import threading
+import multiprocessing
+
+from metrics import REGISTRY, STAGE_SECONDS, STAGE_RUNS
+
+DAG_STATE_PATH = os.getenv("DAG_STATE_PATH", "data/dag_state.json")
+FAILED = ("failed", "timeout", "upstream_failed")
+
+
+class Stage:
+    """Nœud du graphe. `func()` peut retourner un dict d'infos (ex: {"rows": ...}).
+
+    `inputs`: chemins (fichiers ou dossiers) dont le contenu décide du saut; None = toujours exécutée.
+    """
+
+    def __init__(self, name, func, deps=(), inputs=None, retries=0, timeout=None, backoff=1.0):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+
+
+def _files(path):
+    if os.path.isdir(path):
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                yield os.path.join(root, name)
+    elif os.path.exists(path):
+        yield path
+
+
+def fingerprint(paths):
+    """Empreinte du contenu des fichiers (les .gz sont décompressés: l'en-tête gzip contient une date)."""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(f"{path}\0".encode())
+        for name in _files(path):
+            digest.update(f"{os.path.relpath(name, path)}\0".encode())
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(name, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def _child(func, conn):
+    # les métriques de l'étape (processus neuf) repartent avec le résultat
+    try:
+        conn.send((True, func(), REGISTRY.snapshot()))
+    except BaseException as e:
+        conn.send((False, f"{type(e).__name__}: {e}", REGISTRY.snapshot()))
+    finally:
+        conn.close()
+
+
+def _call_in_process(context, func, timeout):
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(func, child))
+    process.start()
+    child.close()
+    try:
+        if not parent.poll(timeout):
+            process.terminate()
+            raise TimeoutError(f"stage exceeded {timeout}s")
+        try:
+            ok, value, snapshot = parent.recv()
+            REGISTRY.merge(snapshot)
+        except EOFError:
+            process.join()
+            raise RuntimeError(f"stage process exited with code {process.exitcode}") from None
+    finally:
+        process.join()
+        parent.close()
+    if not ok:
+        raise RuntimeError(value)
+    return value
+
+
+class DAG:
+    def __init__(self, stages, max_workers=4, executor="thread", state_path=DAG_STATE_PATH):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("duplicate stage names")
+        self.order = self._toposort()
+        self.max_workers = max_workers
+        self.executor = executor
+        self.state_path = state_path
+        self.context = multiprocessing.get_context("spawn")
+
+    def _toposort(self):
+        order, marks = [], {}
+
+        def visit(name, path):
+            if marks.get(name) == "done":
+                return
+            if marks.get(name) == "visiting":
+                raise ValueError(f"cycle in stage graph: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"unknown stage dependency: {name}")
+            marks[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            marks[name] = "done"
+            order.append(self.stages[name])
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def _start(self, stage, attempt, done):
+        def target():
+            try:
+                if self.executor == "process":
+                    value = _call_in_process(self.context, stage.func, stage.timeout)
+                else:
+                    value = stage.func()
+                done.put((stage.name, attempt, None, value))
+            except BaseException as e:
+                done.put((stage.name, attempt, f"{type(e).__name__}: {e}", None))
+
+        threading.Thread(target=target, name=f"stage-{stage.name}", daemon=True).start()
+
+    def run(self, force=False, report=None):
+        """Exécute le graphe; retourne {étape: {"status", "attempts", "duration", ...}}.
+
+        `report` (jobs.JobReporter) reçoit start_stage / end_stage; `force` ignore les empreintes.
+        """
+        state = self._load_state()
+        results = {}
+        waiting = list(self.order)
+        ready = []        # (heure de départ, étape, empreinte)
+        running = {}      # nom -> (tentative, échéance, début, empreinte)
+        attempts = {}
+        done = queue.Queue()
+
+        def finish(name, status, **info):
+            results[name] = dict(info, status=status, attempts=attempts.get(name, 0))
+            STAGE_RUNS.inc(stage=name, status=status)
+            if "duration" in info and status != "skipped":
+                STAGE_SECONDS.observe(info["duration"], stage=name, status=status)
+            if report is not None:
+                report.end_stage(name, status, **results[name])
+
+        while waiting or ready or running:
+            # étapes dont toutes les dépendances sont terminées
+            for stage in list(waiting):
+                deps = [results.get(d) for d in stage.deps]
+                if any(r is None for r in deps):
+                    continue
+                waiting.remove(stage)
+                if any(r["status"] in FAILED for r in deps):
+                    finish(stage.name, "upstream_failed")
+                    continue
+                fp = fingerprint(stage.inputs) if stage.inputs is not None else None
+                if not force and fp is not None and state.get(stage.name) == fp:
+                    finish(stage.name, "skipped", duration=0.0)
+                    continue
+                ready.append((time.monotonic(), stage, fp))
+
+            now = time.monotonic()
+            for item in sorted(ready, key=lambda i: i[0]):
+                not_before, stage, fp = item
+                if len(running) >= self.max_workers or not_before > now:
+                    continue
+                ready.remove(item)
+                attempts[stage.name] = attempts.get(stage.name, 0) + 1
+                deadline = now + stage.timeout if stage.timeout and self.executor != "process" else None
+                running[stage.name] = (attempts[stage.name], deadline, now, fp)
+                if report is not None and attempts[stage.name] == 1:
+                    report.start_stage(stage.name)
+                self._start(stage, attempts[stage.name], done)
+
+            # attente du prochain événement: fin d'une tentative, échéance ou retry
+            wakeups = [d for _, d, _, _ in running.values() if d] + [i[0] for i in ready if len(running) < self.max_workers]
+            wait = max(0.0, min(wakeups) - time.monotonic()) if wakeups else None
+            if not running and wait is None:
+                continue
+            try:
+                name, attempt, error, value = done.get(timeout=wait)
+            except queue.Empty:
+                name, attempt, error, value = None, None, None, None
+                now = time.monotonic()
+                for running_name, (n, deadline, _, _) in running.items():
+                    if deadline and deadline <= now:
+                        name, attempt, error = running_name, n, f"TimeoutError: stage exceeded {self.stages[running_name].timeout}s"
+                        break
+                if name is None:
+                    continue
+
+            current = running.get(name)
+            if current is None or current[0] != attempt:
+                continue  # tentative déjà abandonnée (timeout)
+            _, _, started, fp = running.pop(name)
+            stage = self.stages[name]
+            duration = round(time.monotonic() - started, 3)
+            if error is None:
+                if fp is not None:
+                    state[name] = fp
+                    self._save_state(state)
+                finish(name, "succeeded", duration=duration, **(value if isinstance(value, dict) else {}))
+            elif attempt <= stage.retries:
+                print(f"⚠️ Stage {name} attempt {attempt} failed ({error}), retrying")
+                ready.append((time.monotonic() + stage.backoff * 2 ** (attempt - 1), stage, fp))
+            else:
+                status = "timeout" if error.startswith("TimeoutError") else "failed"
+                finish(name, status, duration=duration, error=error)
+
+        return results
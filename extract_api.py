@@ -1,128 +1,175 @@
 import os
 import json
-import time
-import requests
+from datetime import date
 from dotenv import load_dotenv
 
+from api_fetcher import PageFetcher
+from raw_store import raw_path, open_raw, iter_jsonl
+
 # تحميل API Key من .env
 load_dotenv()
 API_KEY = os.getenv("BALLDONTLIE_API_KEY")
-if not API_KEY:
-    raise ValueError("❌ BALLDONTLIE_API_KEY is not set in .env!")
 
 RAW_DIR = "data/raw"
 os.makedirs(RAW_DIR, exist_ok=True)
-
-BASE_URL = "https://api.balldontlie.io/v1"
-HEADERS = {"Authorization": f"Bearer {API_KEY}", "Accept": "application/json"}
-
-
-def fetch_all_players(per_page=100, max_players=200):
-    
-    players = []
-    page = 1
-    total_fetched = 0
-
-    while total_fetched < max_players:
-        try:
-            response = requests.get(
-                f"{BASE_URL}/players",
-                params={"per_page": per_page, "page": page},
-                headers=HEADERS,
-                timeout=30
-            )
-            if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", "10"))
-                print(f"⏳ Rate limited on players page {page}. Waiting {retry_after}s...")
-                time.sleep(retry_after)
-                continue
-            if not response.ok:
-                response.raise_for_status()
-
-            data = response.json()
-
-            batch = data.get("data", [])
-            if not batch:
-                break
-
-            players.extend(batch)
-            total_fetched += len(batch)
-            print(f"✅ Collected {total_fetched} players so far")
-
-            page += 1
-            time.sleep(1.5)  # small pacing between pages
-
-        except requests.HTTPError as http_err:
-            print(f"⚠️ HTTP error on players page {page}: {http_err}. Retrying in 10s...")
-            time.sleep(10)
-            continue
-        except Exception as e:
-            print(f"⚠️ Error fetching players on page {page}: {e}. Retrying in 10s...")
-            time.sleep(10)
-            continue
-
- 
-    with open(f"{RAW_DIR}/api_players.json", "w") as f:
-        json.dump(players[:max_players], f, indent=2)
-
-    print(f"🎉 Finished fetching {len(players[:max_players])} players")
-    return players[:max_players]
-
-
-def fetch_games(season=2023, per_page=100, max_games=200):
-    """جلب مباريات NBA من API"""
-    games = []
-    page = 1
-    total_fetched = 0
-
-    while total_fetched < max_games:
-        try:
-            response = requests.get(
-                f"{BASE_URL}/games",
-                params={"per_page": per_page, "page": page, "seasons[]": season},
-                headers=HEADERS,
-                timeout=30
-            )
-            if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", "10"))
-                print(f"⏳ Rate limited on games page {page}. Waiting {retry_after}s...")
-                time.sleep(retry_after)
-                continue
-            if not response.ok:
-                response.raise_for_status()
-
-            data = response.json()
-
-            batch = data.get("data", [])
-            if not batch:
-                break
-
-            games.extend(batch)
-            total_fetched += len(batch)
-            print(f"🏀 Collected {total_fetched} games so far")
-
-            page += 1
-            time.sleep(1.5)  # small pacing between pages
-
-        except requests.HTTPError as http_err:
-            print(f"⚠️ HTTP error on games page {page}: {http_err}. Retrying in 10s...")
-            time.sleep(10)
+# high-water marks للاستخراج التزايدي
+STATE_PATH = f"{RAW_DIR}/extract_state.json"
+
+PUBLIC_BASE_URL = "https://api.balldontlie.io/v1"
+# BALLDONTLIE_BASE_URL: ex. le faux serveur local de mock_api.py
+BASE_URL = os.getenv("BALLDONTLIE_BASE_URL", PUBLIC_BASE_URL)
+
+# عدد الصفحات المتوازية وعدد الطلبات في الثانية
+MAX_WORKERS = int(os.getenv("API_MAX_WORKERS", "4"))
+RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", "0.66"))
+# balayage complet de /players (seul moyen de voir les fiches modifiées), en jours
+PLAYERS_RESCAN_DAYS = int(os.getenv("API_PLAYERS_RESCAN_DAYS", "7"))
+
+
+def _fetcher():
+    # la clé n'est exigée que pour l'API publique (et seulement au moment d'extraire)
+    if not API_KEY and BASE_URL == PUBLIC_BASE_URL:
+        raise ValueError("❌ BALLDONTLIE_API_KEY is not set in .env!")
+    headers = {"Accept": "application/json"}
+    if API_KEY:
+        headers["Authorization"] = f"Bearer {API_KEY}"
+    return PageFetcher(BASE_URL, headers=headers, max_workers=MAX_WORKERS, rate=RATE_LIMIT)
+
+
+def _load_state():
+    if not os.path.exists(STATE_PATH):
+        return {"players": {}, "games": {}}
+    with open(STATE_PATH) as f:
+        state = json.load(f)
+    state.setdefault("players", {})
+    state.setdefault("games", {})
+    return state
+
+
+def _save_state(state):
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+
+def _merge_snapshot(name, delta_path):
+    """دمج السجلات الجديدة في الملف الخام حسب id (الأحدث يستبدل القديم) دون تحميل الملف كاملاً"""
+    path = raw_path(name)
+    delta = {r["id"]: r for r in iter_jsonl(delta_path) if r.get("id") is not None}
+    # le suffixe (.jsonl / .jsonl.gz) est conservé pour que open_raw choisisse le bon format
+    base, ext = path.split(".jsonl", 1)
+    tmp = f"{base}.tmp.jsonl{ext}"
+    with open_raw(tmp, "w") as out:
+        for r in iter_jsonl(path):
+            if r.get("id") not in delta:
+                out.write(json.dumps(r, separators=(",", ":")) + "\n")
+        for r in delta.values():
+            out.write(json.dumps(r, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+    os.remove(delta_path)
+    return path, list(delta.values())
+
+
+def fetch_all_players(per_page=100, max_players=200, incremental=True):
+    """جلب اللاعبين من API
+
+    /players n'a ni date ni curseur de modification: le curseur de page ne fait qu'avancer et
+    ne ramasse que les nouveaux joueurs (ajoutés en fin de liste). Un transfert ou une fiche
+    corrigée n'est relu qu'au prochain balayage complet, relancé depuis la page 1 tous les
+    API_PLAYERS_RESCAN_DAYS jours, ou dès que per_page change (les pages sont décalées).
+    """
+    state = _load_state()
+    saved = state["players"] if incremental else {}
+    cursor = saved.get("next_page", 1)
+    sweep_started, full_scan_at = saved.get("sweep_started"), saved.get("full_scan_at")
+    today = date.today()
+    if saved.get("per_page") != per_page:
+        cursor = 1
+    elif full_scan_at and full_scan_at == sweep_started \
+            and (today - date.fromisoformat(full_scan_at)).days >= PLAYERS_RESCAN_DAYS:
+        # balayage précédent terminé et trop ancien: on repart du début
+        cursor = 1
+    if cursor == 1:
+        sweep_started = today.isoformat()
+    delta_path = f"{RAW_DIR}/api_players.delta.jsonl"
+
+    with _fetcher() as fetcher:
+        count = fetcher.fetch_to(delta_path, "players", per_page=per_page, max_items=max_players,
+                                 name="api_players", start_page=cursor)
+
+    if count < max_players:
+        # fin de liste atteinte: le balayage commencé le sweep_started est complet
+        full_scan_at = sweep_started
+    # الصفحة الأخيرة غير المكتملة تُعاد في التشغيل القادم
+    state["players"] = {"next_page": cursor + count // per_page, "per_page": per_page,
+                        "sweep_started": sweep_started, "full_scan_at": full_scan_at}
+    path, players = _merge_snapshot("api_players", delta_path)
+    _save_state(state)
+
+    print(f"🎉 Finished fetching {count} new players into {path}")
+    return players
+
+
+def _is_final(game):
+    # le calendrier renvoie aussi les matchs à venir: statut = heure du match, score 0-0
+    return game.get("status") == "Final"
+
+
+def fetch_games(season=2023, per_page=100, max_games=200, incremental=True):
+    """جلب مباريات NBA من API
+
+    L'API ne trie pas par date: last_date n'avance qu'une fois la plage [last_date, ∞) lue en
+    entier. Une passe tronquée par max_games garde un curseur de page pour la passe suivante.
+    last_date ne dépasse ni le dernier match terminé ("Final"), ni le premier match pas encore
+    terminé de la plage, ni aujourd'hui: les scores à venir sont relus tant qu'ils manquent.
+    """
+    state = _load_state()
+    mark = state["games"].get(str(season), {}) if incremental else {}
+    cursor = mark.get("cursor") or {"start_date": mark.get("last_date"), "next_page": 1,
+                                     "last_final": mark.get("last_date", ""), "first_open": None}
+    params = {"seasons[]": season}
+    if cursor["start_date"]:
+        # start_date شامل: نعيد جلب آخر يوم لالتقاط النتائج المحدثة
+        params["start_date"] = cursor["start_date"]
+    delta_path = f"{RAW_DIR}/api_games_{season}.delta.jsonl"
+
+    with _fetcher() as fetcher:
+        count = fetcher.fetch_to(delta_path, "games", params=params, per_page=per_page,
+                                 max_items=max_games, name=f"api_games_{season}",
+                                 start_page=cursor["next_page"])
+
+    path, games = _merge_snapshot("api_games", delta_path)
+    # depuis le début de la plage (passes précédentes comprises): dernier jour terminé,
+    # premier jour pas encore terminé
+    # (.get: curseurs enregistrés avant l'ajout de first_open)
+    last_final = cursor.get("last_final", cursor.get("last_date", ""))
+    first_open = cursor.get("first_open")
+    for g in games:
+        day = (g.get("date") or "")[:10]
+        if not day:
             continue
-        except Exception as e:
-            print(f"⚠️ Error fetching games on page {page}: {e}. Retrying in 10s...")
-            time.sleep(10)
-            continue
-
-  
-    with open(f"{RAW_DIR}/api_games.json", "w") as f:
-        json.dump(games[:max_games], f, indent=2)
-
-    print(f"🎉 Finished fetching {len(games[:max_games])} games")
-    return games[:max_games]
-
-
-def run_api():
+        if _is_final(g):
+            last_final = max(last_final, day)
+        elif first_open is None or day < first_open:
+            first_open = day
+    if count >= max_games:
+        # الصفحة الأخيرة غير المكتملة تُعاد في التشغيل القادم
+        mark = {k: v for k, v in mark.items() if k != "cursor"}
+        mark["cursor"] = {"start_date": cursor["start_date"], "next_page": cursor["next_page"] + count // per_page,
+                          "last_final": last_final, "first_open": first_open}
+    else:
+        last_date = min(d for d in (last_final, first_open, date.today().isoformat()) if d is not None)
+        mark = {"last_date": last_date} if last_date else {}
+    state["games"][str(season)] = mark
+    _save_state(state)
+
+    print(f"🎉 Finished fetching {count} new games into {path}")
+    return games
+
+
+def run_api(incremental=True):
  
-    players = fetch_all_players(per_page=100, max_players=200)
-    games = fetch_games(season=2023, per_page=100, max_games=200)
+    players = fetch_all_players(per_page=100, max_players=200, incremental=incremental)
+    games = fetch_games(season=2023, per_page=100, max_games=200, incremental=incremental)
     return players, games
@@ -1,15 +1,174 @@
-import json, os
-from datetime import datetime
+#!/usr/bin/env python3
+"""Source "big data": flux d'événements de match en JSONL (un événement par ligne).
+
+- run_big: générateur synthétique, écrit par lots (BIG_WRITE_BATCH lignes par write);
+- aggregate_big: relit le fichier par blocs Arrow (mémoire constante, même à des dizaines de
+  millions de lignes), agrège par (joueur, événement) et écrit data/curated/player_events.parquet,
+  chargé ensuite dans PostgreSQL (player_event_totals) et MongoDB (player_events).
+
+    python extract_big.py --events 20000000 --aggregate
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+from metrics import ROWS, BYTES_WRITTEN
+from raw_store import raw_path, open_raw
+
 RAW_DIR = "data/raw"
 os.makedirs(RAW_DIR, exist_ok=True)
+CURATED_DIR = "data/curated"
+
+BIG_EVENTS = int(os.getenv("BIG_EVENTS", "5000"))
+BIG_PLAYERS = int(os.getenv("BIG_PLAYERS", "500"))
+BIG_WRITE_BATCH = int(os.getenv("BIG_WRITE_BATCH", "10000"))
+# octets lus par bloc Arrow, et nombre d'agrégats partiels gardés avant de les fusionner
+BIG_BLOCK_SIZE = int(os.getenv("BIG_BLOCK_SIZE", str(16 << 20)))
+BIG_COMBINE_EVERY = int(os.getenv("BIG_COMBINE_EVERY", "16"))
+
+# types d'événements ("score" en premier: 2 ou 3 points, les autres comptent 1)
+EVENTS = ["score", "free_throw", "rebound", "assist", "steal", "block", "turnover", "foul"]
+EVENT_SCHEMA = pa.schema([
+    ("player_id", pa.int64()),
+    ("event", pa.string()),
+    ("value", pa.int64()),
+    ("timestamp", pa.timestamp("us")),
+])
+AGGREGATE_SCHEMA = pa.schema([
+    ("player_id", pa.int64()),
+    ("event", pa.string()),
+    ("events", pa.int64()),
+    ("total", pa.int64()),
+    ("first_at", pa.timestamp("us")),
+    ("last_at", pa.timestamp("us")),
+])
+
+
+def _rate(count, seconds):
+    return round(count / seconds) if seconds > 0 else count
+
+
+def _event_lines(rng, offset, count, players, kinds, start_at):
+    """Un lot d'événements tirés en vectoriel, formatés en lignes JSON."""
+    player_ids = rng.integers(100, 100 + players, count)
+    kind_index = rng.integers(0, len(kinds), count)
+    # "score" vaut 2 ou 3 points, les autres événements 1
+    values = np.where(kind_index == 0, rng.integers(2, 4, count), 1)
+    stamps = (start_at + np.arange(offset, offset + count).astype("timedelta64[s]")).astype(str)
+    names = np.array(kinds)[kind_index]
+    return "".join(
+        f'{{"player_id":{p},"event":"{e}","value":{v},"timestamp":"{t}"}}\n'
+        for p, e, v, t in zip(player_ids.tolist(), names.tolist(), values.tolist(), stamps.tolist())
+    )
+
+
+def run_big(events=None, players=None, seed=42, batch_size=None):
+    """Écrit `events` événements synthétiques, un write par lot; retourne le chemin du fichier."""
+    events = BIG_EVENTS if events is None else events
+    players = players or BIG_PLAYERS
+    batch_size = batch_size or BIG_WRITE_BATCH
+    rng = np.random.default_rng(seed)
+    start_at = np.datetime64("2024-01-01T00:00:00", "s")
+    path = raw_path("bigdata", RAW_DIR)
+
+    start = time.perf_counter()
+    with open_raw(path, "w") as f:
+        for offset in range(0, events, batch_size):
+            f.write(_event_lines(rng, offset, min(batch_size, events - offset), players, list(EVENTS), start_at))
+    seconds = time.perf_counter() - start
+    ROWS.inc(events, step="extract_big", kind="events", direction="out")
+    BYTES_WRITTEN.inc(os.path.getsize(path), target="raw")
+    print(f"✅ Big JSONL file created: {events} events in {seconds:.2f}s ({_rate(events, seconds)} events/s)")
+    return path
+
+
+def iter_event_batches(path, block_size=None):
+    """Lit le JSONL d'événements (éventuellement .gz) par blocs Arrow typés."""
+    reader = pj.open_json(
+        pa.input_stream(path),
+        read_options=pj.ReadOptions(block_size=block_size or BIG_BLOCK_SIZE),
+        parse_options=pj.ParseOptions(explicit_schema=EVENT_SCHEMA, unexpected_field_behavior="ignore"),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch
+
+
+def _partial(batch):
+    """Agrégat (joueur, événement) d'un bloc, en une passe vectorisée."""
+    table = pa.Table.from_batches([batch]).filter(pc.is_valid(batch.column("player_id")))
+    table = table.group_by(["player_id", "event"]).aggregate([
+        ("value", "count"), ("value", "sum"), ("timestamp", "min"), ("timestamp", "max"),
+    ])
+    return table.select(["player_id", "event", "value_count", "value_sum", "timestamp_min", "timestamp_max"]) \
+        .rename_columns(AGGREGATE_SCHEMA.names).cast(AGGREGATE_SCHEMA)
+
+
+def _combine(tables):
+    """Fusionne des agrégats partiels: sommes des compteurs, min/max des dates."""
+    table = pa.concat_tables(tables)
+    table = table.group_by(["player_id", "event"]).aggregate([
+        ("events", "sum"), ("total", "sum"), ("first_at", "min"), ("last_at", "max"),
+    ])
+    return table.select(["player_id", "event", "events_sum", "total_sum", "first_at_min", "last_at_max"]) \
+        .rename_columns(AGGREGATE_SCHEMA.names).cast(AGGREGATE_SCHEMA)
+
+
+def aggregate_events(path, block_size=None, combine_every=None):
+    """Agrégats par (joueur, événement) et nombre d'événements lus.
+
+    La mémoire reste bornée par le nombre de clés distinctes, pas par la taille du fichier.
+    """
+    combine_every = combine_every or BIG_COMBINE_EVERY
+    partials = []
+    count = 0
+    for batch in iter_event_batches(path, block_size):
+        count += batch.num_rows
+        partials.append(_partial(batch))
+        if len(partials) >= combine_every:
+            partials = [_combine(partials)]
+    if not partials:
+        return AGGREGATE_SCHEMA.empty_table(), count
+    result = _combine(partials).sort_by([("player_id", "ascending"), ("event", "ascending")])
+    return result, count
+
+
+def aggregate_big(curated_dir=CURATED_DIR):
+    """Agrège data/raw/bigdata.jsonl dans la couche curated (player_events.parquet)."""
+    path = raw_path("bigdata", RAW_DIR)
+    if not os.path.exists(path):
+        print("⚠️ Big data aggregation skipped: bigdata.jsonl not found.")
+        return {"rows": {"events": 0, "aggregates": 0}}
+
+    start = time.perf_counter()
+    table, count = aggregate_events(path)
+    seconds = time.perf_counter() - start
+
+    os.makedirs(curated_dir, exist_ok=True)
+    out = os.path.join(curated_dir, "player_events.parquet")
+    pq.write_table(table, out)
+    ROWS.inc(count, step="aggregate_big", kind="events", direction="in")
+    ROWS.inc(table.num_rows, step="aggregate_big", kind="player_events", direction="out")
+    BYTES_WRITTEN.inc(os.path.getsize(out), target="curated")
+    print(f"✅ Aggregated {count} events into {table.num_rows} player/event totals "
+          f"in {seconds:.2f}s ({_rate(count, seconds)} events/s)")
+    return {"rows": {"events": count, "aggregates": table.num_rows}, "events_per_s": _rate(count, seconds)}
+
 
-def run_big():
-    with open(f"{RAW_DIR}/bigdata.jsonl", "w") as f:
-        for i in range(5_000):
-            f.write(json.dumps({
-                "player_id": 100+i,
-                "event": "score",
-                "value": 2,
-                "timestamp": datetime.utcnow().isoformat()
-            }) + "\n")
-    print("Big JSONL file created")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=BIG_EVENTS)
+    parser.add_argument("--players", type=int, default=BIG_PLAYERS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--aggregate", action="store_true", help="agréger ensuite dans la couche curated")
+    args = parser.parse_args()
+    run_big(args.events, args.players, args.seed)
+    if args.aggregate:
+        print(json.dumps(aggregate_big()))
@@ -1,53 +1,299 @@
 import os
+import re
+import json
+import time
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlparse
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
-from io import StringIO
+from lxml import html as lxml_html
 
 # -------------------------------
 # إعداد المجلد
 # -------------------------------
 RAW_DIR = "data/raw"
 os.makedirs(RAW_DIR, exist_ok=True)
+# réponses HTTP gardées sur disque (corps + ETag/Last-Modified) pour les requêtes conditionnelles
+WEB_CACHE_DIR = os.getenv("WEB_CACHE_DIR", "data/web_cache")
+WEB_STATE_PATH = os.path.join(RAW_DIR, "web_state.json")
 
-def run_web():
-    url = "https://en.wikipedia.org/wiki/NBA_Most_Valuable_Player_Award"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer": "https://en.wikipedia.org/",
-    }
-    response = None
-    for attempt in range(3):
-        resp = requests.get(url, headers=headers, timeout=20)
-        if resp.status_code == 200:
-            response = resp
-            break
-        print(f"⚠️ Wikipedia fetch attempt {attempt+1}/3 failed with {resp.status_code}. Retrying...")
-        time.sleep(2 ** attempt * 2)
-
-    if response is None or response.status_code != 200:
-        print("⚠️ Could not fetch Wikipedia page after retries. Skipping web extraction.")
-        return []
-
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    # جميع الجداول
-    tables = soup.find_all("table", {"class": "wikitable"})
-    print(f"🔍 Found {len(tables)} wikitable tables on the page")
-
-    # حفظ كل جدول
-    for idx, table in enumerate(tables):
-        # تحويل HTML إلى DataFrame
-        df = pd.read_html(str(table))[0]
-
-        # تنظيف الأعمدة الفارغة
-        df = df.dropna(how="all")
-        df.to_csv(f"{RAW_DIR}/mvp_wiki_table_{idx+1}.csv", index=False)
-        print(f"✅ Table {idx+1} saved: {len(df)} rows, columns: {list(df.columns)}")
-    
-    print("🎉 All tables saved successfully!")
-    return tables
+# pages téléchargées en parallèle, politesse par hôte (requêtes simultanées, délai entre départs)
+WEB_MAX_WORKERS = int(os.getenv("WEB_MAX_WORKERS", "8"))
+WEB_PER_HOST = int(os.getenv("WEB_PER_HOST", "2"))
+WEB_HOST_DELAY = float(os.getenv("WEB_HOST_DELAY", "0.5"))
+WEB_PARSE_WORKERS = int(os.getenv("WEB_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+WEB_PAGES_FILE = os.getenv("WEB_PAGES_FILE")
+WEB_STANDINGS_SEASONS = [int(s) for s in os.getenv("WEB_STANDINGS_SEASONS", "2023").split(",") if s.strip()]
+
+MVP_URL = "https://en.wikipedia.org/wiki/NBA_Most_Valuable_Player_Award"
+DPOY_URL = "https://en.wikipedia.org/wiki/NBA_Defensive_Player_of_the_Year_Award"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://en.wikipedia.org/",
+}
+WIKITABLE_XPATH = "//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')]"
+
+
+class HttpCache:
+    """Cache disque: {sha1(url)}.html (corps) et {sha1(url)}.json (ETag, Last-Modified, empreinte)."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or WEB_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".html"), os.path.join(self.cache_dir, key + ".json")
+
+    def load(self, url):
+        """(corps, méta) en cache, ou (None, {})."""
+        body_path, meta_path = self._paths(url)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None, {}
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return f.read(), meta
+
+    def store(self, url, body, headers):
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "sha1": hashlib.sha1(body).hexdigest(),
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp = path + ".tmp"
+            with open(tmp, mode) as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return meta
+
+
+def fetch(url, cache=None, headers=None, retries=3, session=None):
+    """GET conditionnel: (corps, empreinte, "fetched" | "not_modified"), ou (None, None, "failed").
+
+    Une page inchangée répond 304 et coûte un aller-retour sans corps; le corps vient du cache.
+    """
+    cache = cache or HttpCache()
+    http = session or requests
+    cached, meta = cache.load(url)
+    request_headers = dict(headers or {})
+    if cached is not None:
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    for attempt in range(retries):
+        try:
+            resp = http.get(url, headers=request_headers, timeout=20)
+        except requests.RequestException as e:
+            print(f"⚠️ {url} fetch attempt {attempt+1}/{retries} failed: {e}. Retrying...")
+        else:
+            if resp.status_code == 304 and cached is not None:
+                return cached, meta["sha1"], "not_modified"
+            if resp.status_code == 200:
+                meta = cache.store(url, resp.content, resp.headers)
+                return resp.content, meta["sha1"], "fetched"
+            print(f"⚠️ {url} fetch attempt {attempt+1}/{retries} failed with {resp.status_code}. Retrying...")
+        if attempt + 1 < retries:
+            time.sleep(2 ** attempt * 2)
+    return None, None, "failed"
+
+
+def _span(cell, name):
+    return max(1, int(re.sub(r"\D", "", cell.get(name, "")) or 1))
+
+
+def table_rows(table):
+    """Lignes d'un <table> lxml, rowspan/colspan dépliés (comme pd.read_html)."""
+    rows, pending = [], {}
+    for tr in table.xpath("./tr|./thead/tr|./tbody/tr|./tfoot/tr"):
+        row, col = [], 0
+        cells = iter(tr.xpath("./th|./td"))
+        while True:
+            if col in pending:
+                remaining, value = pending.pop(col)
+                if remaining > 1:
+                    pending[col] = (remaining - 1, value)
+                row.append(value)
+                col += 1
+                continue
+            cell = next(cells, None)
+            if cell is None:
+                if any(c > col for c in pending):
+                    row.append(None)
+                    col += 1
+                    continue
+                break
+            value = " ".join(cell.text_content().split()) or None
+            rowspan = _span(cell, "rowspan")
+            for _ in range(_span(cell, "colspan")):
+                if rowspan > 1:
+                    pending[col] = (rowspan - 1, value)
+                row.append(value)
+                col += 1
+        if row:
+            rows.append((row, all(c.tag == "th" for c in tr.xpath("./th|./td"))))
+    return rows
+
+
+def table_frame(table):
+    rows = table_rows(table)
+    header = rows[0][0] if rows and rows[0][1] else None
+    body = [r for r, _ in rows[1:]] if header else [r for r, _ in rows]
+    width = max([len(header or [])] + [len(r) for r in body])
+    body = [r + [None] * (width - len(r)) for r in body]
+    if header:
+        header = header + [f"Unnamed: {i}" for i in range(len(header), width)]
+    return pd.DataFrame(body, columns=header).dropna(how="all")
+
+
+def extract_tables(page, selector=WIKITABLE_XPATH):
+    """Tableaux de la page désignés par `selector` (XPath), en un seul parsing lxml.
+
+    Exécuté dans le pool de processus de run_web: le parsing HTML est limité par le CPU.
+    """
+    doc = lxml_html.fromstring(page)
+    return [table_frame(t) for t in doc.xpath(selector)]
+
+
+def _load_state():
+    if not os.path.exists(WEB_STATE_PATH):
+        return {}
+    with open(WEB_STATE_PATH) as f:
+        return json.load(f)
+
+
+def _save_state(state):
+    tmp = WEB_STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, WEB_STATE_PATH)
+
+
+class PageSpec:
+    """Une page à extraire: ses tableaux (XPath `selector`) vont dans {RAW_DIR}/{name}_table_N.csv."""
+
+    def __init__(self, name, url, selector=WIKITABLE_XPATH):
+        self.name = name
+        self.url = url
+        self.selector = selector
+
+    def outputs(self, count):
+        return [f"{RAW_DIR}/{self.name}_table_{i+1}.csv" for i in range(count)]
+
+
+def default_pages():
+    """MVP, DPOY et classements des saisons WEB_STANDINGS_SEASONS; WEB_PAGES_FILE (JSON) les remplace."""
+    if WEB_PAGES_FILE:
+        with open(WEB_PAGES_FILE) as f:
+            return [PageSpec(**spec) for spec in json.load(f)]
+    pages = [PageSpec("mvp_wiki", MVP_URL), PageSpec("dpoy_wiki", DPOY_URL)]
+    for season in WEB_STANDINGS_SEASONS:
+        label = f"{season}–{(season + 1) % 100:02d}"
+        pages.append(PageSpec(f"standings_{season}", f"https://en.wikipedia.org/wiki/{label}_NBA_season"))
+    return pages
+
+
+class HostLimiter:
+    """Politesse par hôte: au plus `per_host` requêtes en vol, et `delay` secondes entre deux départs."""
+
+    def __init__(self, per_host=None, delay=None):
+        self.per_host = per_host or WEB_PER_HOST
+        self.delay = WEB_HOST_DELAY if delay is None else delay
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            entry = self.hosts.setdefault(host, {"sem": threading.Semaphore(self.per_host), "next": 0.0})
+        with entry["sem"]:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, entry["next"])
+                entry["next"] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def run_web(pages=None, cache=None, max_workers=None, parse_workers=None, limiter=None):
+    """Télécharge les pages en parallèle (threads, politesse par hôte) et parse dans un pool de processus.
+
+    Une page dont le contenu et le sélecteur n'ont pas changé depuis la dernière écriture est sautée.
+    """
+    pages = pages if pages is not None else default_pages()
+    cache = cache or HttpCache()
+    limiter = limiter or HostLimiter()
+    parse_workers = parse_workers or WEB_PARSE_WORKERS
+    state = _load_state()
+    sessions = threading.local()
+    results = {}
+
+    def download(spec):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        with limiter.slot(spec.url):
+            return fetch(spec.url, cache, HEADERS, session=sessions.session)
+
+    def write(spec, tables, digest):
+        # tableaux disparus de la page: leurs anciens CSV aussi
+        for path in spec.outputs(state.get(spec.url, {}).get("tables", 0))[len(tables):]:
+            if os.path.exists(path):
+                os.remove(path)
+        for path, df in zip(spec.outputs(len(tables)), tables):
+            df.to_csv(path, index=False)
+        state[spec.url] = {"name": spec.name, "selector": spec.selector, "sha1": digest, "tables": len(tables)}
+        results[spec.name] = {"status": "written", "tables": len(tables)}
+        print(f"✅ {spec.name}: {len(tables)} tables saved")
+
+    parse_pool = None
+    if parse_workers > 1:
+        parse_pool = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context("spawn"))
+    parsing = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or WEB_MAX_WORKERS) as pool:
+            downloads = {pool.submit(download, spec): spec for spec in pages}
+            for future in as_completed(downloads):
+                spec = downloads[future]
+                page, digest, fetch_status = future.result()
+                if page is None:
+                    print(f"⚠️ Could not fetch {spec.url} after retries. Skipping {spec.name}.")
+                    results[spec.name] = {"status": "failed", "tables": 0}
+                    continue
+                # même contenu et même sélecteur que lors de la dernière écriture: CSV déjà à jour
+                previous = state.get(spec.url, {})
+                outputs = spec.outputs(previous.get("tables", 0))
+                if previous.get("sha1") == digest and previous.get("selector") == spec.selector \
+                        and all(os.path.exists(p) for p in outputs):
+                    print(f"⏭️ {spec.name} unchanged ({fetch_status}): {len(outputs)} tables kept")
+                    results[spec.name] = {"status": "unchanged", "tables": len(outputs)}
+                elif parse_pool is None:
+                    write(spec, extract_tables(page, spec.selector), digest)
+                else:
+                    parsing[parse_pool.submit(extract_tables, page, spec.selector)] = (spec, digest)
+        for future in as_completed(parsing):
+            spec, digest = parsing[future]
+            write(spec, future.result(), digest)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        _save_state(state)
+
+    tables = sum(r["tables"] for r in results.values())
+    print(f"🎉 Web extraction: {len(pages)} pages, {tables} tables")
+    return {"pages": results, "tables": tables}
 
 if __name__ == "__main__":
     run_web()
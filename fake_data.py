@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Générateur de données NBA synthétiques au format balldontlie (v1), déterministe (seed).
+
+Joueurs, matchs et stats avec les objets équipe imbriqués, à n'importe quelle taille:
+
+    python fake_data.py --players 5000 --games 100000 --stats 0 --out data/raw
+"""
+import os
+import json
+import random
+import argparse
+from datetime import date, timedelta
+
+from raw_store import open_raw
+
+# les 30 franchises (id balldontlie, abréviation, ville, nom, conférence, division)
+TEAMS = [
+    (1, "ATL", "Atlanta", "Hawks", "East", "Southeast"),
+    (2, "BOS", "Boston", "Celtics", "East", "Atlantic"),
+    (3, "BKN", "Brooklyn", "Nets", "East", "Atlantic"),
+    (4, "CHA", "Charlotte", "Hornets", "East", "Southeast"),
+    (5, "CHI", "Chicago", "Bulls", "East", "Central"),
+    (6, "CLE", "Cleveland", "Cavaliers", "East", "Central"),
+    (7, "DAL", "Dallas", "Mavericks", "West", "Southwest"),
+    (8, "DEN", "Denver", "Nuggets", "West", "Northwest"),
+    (9, "DET", "Detroit", "Pistons", "East", "Central"),
+    (10, "GSW", "Golden State", "Warriors", "West", "Pacific"),
+    (11, "HOU", "Houston", "Rockets", "West", "Southwest"),
+    (12, "IND", "Indiana", "Pacers", "East", "Central"),
+    (13, "LAC", "LA", "Clippers", "West", "Pacific"),
+    (14, "LAL", "Los Angeles", "Lakers", "West", "Pacific"),
+    (15, "MEM", "Memphis", "Grizzlies", "West", "Southwest"),
+    (16, "MIA", "Miami", "Heat", "East", "Southeast"),
+    (17, "MIL", "Milwaukee", "Bucks", "East", "Central"),
+    (18, "MIN", "Minnesota", "Timberwolves", "West", "Northwest"),
+    (19, "NOP", "New Orleans", "Pelicans", "West", "Southwest"),
+    (20, "NYK", "New York", "Knicks", "East", "Atlantic"),
+    (21, "OKC", "Oklahoma City", "Thunder", "West", "Northwest"),
+    (22, "ORL", "Orlando", "Magic", "East", "Southeast"),
+    (23, "PHI", "Philadelphia", "76ers", "East", "Atlantic"),
+    (24, "PHX", "Phoenix", "Suns", "West", "Pacific"),
+    (25, "POR", "Portland", "Trail Blazers", "West", "Northwest"),
+    (26, "SAC", "Sacramento", "Kings", "West", "Pacific"),
+    (27, "SAS", "San Antonio", "Spurs", "West", "Southwest"),
+    (28, "TOR", "Toronto", "Raptors", "East", "Atlantic"),
+    (29, "UTA", "Utah", "Jazz", "West", "Northwest"),
+    (30, "WAS", "Washington", "Wizards", "East", "Southeast"),
+]
+FIRST_NAMES = ["LeBron", "Stephen", "Kevin", "Giannis", "Luka", "Nikola", "Jayson", "Joel", "Devin", "Anthony",
+               "Jimmy", "Kawhi", "Damian", "Trae", "Ja", "Zion", "Donovan", "Jaylen", "Bam", "Tyrese",
+               "De'Aaron", "Shai", "Paolo", "Victor", "Jalen", "Scottie", "Evan", "Franz", "Chet", "Alperen"]
+LAST_NAMES = ["James", "Curry", "Durant", "Antetokounmpo", "Doncic", "Jokic", "Tatum", "Embiid", "Booker",
+              "Davis", "Butler", "Leonard", "Lillard", "Young", "Morant", "Williamson", "Mitchell", "Brown",
+              "Adebayo", "Haliburton", "Fox", "Gilgeous-Alexander", "Banchero", "Wembanyama", "Brunson",
+              "Barnes", "Mobley", "Wagner", "Holmgren", "Sengun"]
+POSITIONS = ["G", "F", "C", "G-F", "F-C", "F-G", "C-F", ""]
+SEASON_START = {season: date(season, 10, 24) for season in range(1979, 2031)}
+
+
+def team(team_id):
+    tid, abbr, city, name, conference, division = TEAMS[team_id - 1]
+    return {"id": tid, "conference": conference, "division": division, "city": city,
+            "name": name, "full_name": f"{city} {name}", "abbreviation": abbr}
+
+
+def fake_teams():
+    return [team(t[0]) for t in TEAMS]
+
+
+def fake_players(n, seed=42, free_agents=0.05):
+    """`free_agents`: part de joueurs sans équipe (team null, comme dans l'API)."""
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "id": i + 1,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "position": rng.choice(POSITIONS),
+            "height": f"{rng.randint(5, 7)}-{rng.randint(0, 11)}",
+            "weight": str(rng.randint(170, 290)),
+            "jersey_number": str(rng.randint(0, 99)),
+            "college": rng.choice(["Duke", "Kentucky", "UCLA", "Kansas", "None"]),
+            "country": rng.choice(["USA", "USA", "USA", "France", "Serbia", "Canada", "Greece"]),
+            "draft_year": rng.choice([None, rng.randint(2003, 2023)]),
+            "draft_round": rng.choice([None, 1, 2]),
+            "draft_number": rng.choice([None, rng.randint(1, 60)]),
+            "team": None if rng.random() < free_agents else team(rng.randint(1, 30)),
+        }
+
+
+def fake_games(n, seed=42, seasons=(2021, 2022, 2023), scheduled_from=None):
+    """Matchs joués ("Final"); à partir de `scheduled_from` (date ISO), matchs seulement
+    programmés comme dans le calendrier de l'API: statut = heure du match, score 0-0."""
+    rng = random.Random(seed)
+    for i in range(n):
+        home, visitor = rng.sample(range(1, 31), 2)
+        season = rng.choice(seasons)
+        day = SEASON_START[season] + timedelta(days=rng.randint(0, 170))
+        game = {
+            "id": i + 1,
+            "date": day.isoformat(),
+            "season": season,
+            "status": "Final",
+            "period": 4,
+            "time": "Final",
+            "postseason": day.month in (4, 5, 6),
+            "home_team_score": rng.randint(80, 140),
+            "visitor_team_score": rng.randint(80, 140),
+            "home_team": team(home),
+            "visitor_team": team(visitor),
+        }
+        if scheduled_from and game["date"] >= scheduled_from:
+            game.update(status="7:30 pm ET", period=0, time=None, home_team_score=0, visitor_team_score=0)
+        yield game
+
+
+def fake_stats(n, seed=42, players=1000, games=1000):
+    """Lignes de box-score (/stats): joueur, équipe et match imbriqués."""
+    rng = random.Random(seed)
+    for i in range(n):
+        fga, fg3a, fta = rng.randint(0, 30), rng.randint(0, 15), rng.randint(0, 15)
+        fgm, fg3m, ftm = rng.randint(0, fga), rng.randint(0, fg3a), rng.randint(0, fta)
+        fg3m = min(fg3m, fgm)
+        oreb, dreb = rng.randint(0, 6), rng.randint(0, 12)
+        team_id = rng.randint(1, 30)
+        game_id = rng.randint(1, games)
+        yield {
+            "id": i + 1,
+            "min": str(rng.randint(0, 48)),
+            "fgm": fgm, "fga": fga, "fg_pct": round(fgm / fga, 3) if fga else 0.0,
+            "fg3m": fg3m, "fg3a": fg3a, "fg3_pct": round(fg3m / fg3a, 3) if fg3a else 0.0,
+            "ftm": ftm, "fta": fta, "ft_pct": round(ftm / fta, 3) if fta else 0.0,
+            "oreb": oreb, "dreb": dreb, "reb": oreb + dreb,
+            "ast": rng.randint(0, 15), "stl": rng.randint(0, 5), "blk": rng.randint(0, 5),
+            "turnover": rng.randint(0, 7), "pf": rng.randint(0, 6),
+            "pts": 2 * (fgm - fg3m) + 3 * fg3m + ftm,
+            "player": {"id": rng.randint(1, players), "first_name": rng.choice(FIRST_NAMES),
+                       "last_name": rng.choice(LAST_NAMES), "position": rng.choice(POSITIONS), "team_id": team_id},
+            "team": team(team_id),
+            "game": {"id": game_id, "date": (SEASON_START[2023] + timedelta(days=game_id % 170)).isoformat(),
+                     "season": 2023, "status": "Final", "period": 4, "postseason": False,
+                     "home_team_id": team_id, "visitor_team_id": team_id % 30 + 1,
+                     "home_team_score": rng.randint(80, 140), "visitor_team_score": rng.randint(80, 140)},
+        }
+
+
+def write_jsonl(path, rows):
+    """Écrit `rows` en JSONL (.gz selon l'extension); retourne le nombre de lignes."""
+    count = 0
+    with open_raw(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def write_raw(raw_dir, players=1000, games=10000, stats=0, seed=42, compress=False):
+    """Fichiers bruts au nom attendu par le pipeline (api_players / api_games / api_stats)."""
+    os.makedirs(raw_dir, exist_ok=True)
+    ext = ".jsonl.gz" if compress else ".jsonl"
+    paths = {}
+    datasets = [("api_players", fake_players(players, seed)), ("api_games", fake_games(games, seed))]
+    if stats:
+        datasets.append(("api_stats", fake_stats(stats, seed, players=max(players, 1), games=max(games, 1))))
+    for name, rows in datasets:
+        paths[name] = os.path.join(raw_dir, name + ext)
+        write_jsonl(paths[name], rows)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--stats", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--out", default="data/raw")
+    args = parser.parse_args()
+    print(json.dumps(write_raw(args.out, args.players, args.games, args.stats, args.seed, args.gzip), indent=2))
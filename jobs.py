@@ -0,0 +1,322 @@
+# jobs.py
+"""Jobs ETL: un processus dédié par job, un seul job actif à la fois (single-flight).
+
+L'état de chaque job est un fichier JSON dans JOBS_DIR, écrit par le processus du job:
+tous les workers uvicorn le lisent, quel que soit celui qui a lancé le job. Le lancement
+est sérialisé entre workers par un verrou de fichier (submit.lock), et la fin d'un job est
+signalée dans finished.json: chaque worker y voit les jobs terminés ailleurs (poll).
+"""
+import os
+import json
+import time
+import uuid
+import signal
+import importlib
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from metrics import REGISTRY
+
+JOBS_DIR = os.getenv("ETL_JOBS_DIR", "data/jobs")
+PIPELINE_TARGET = "pipeline:full_pipeline"
+ACTIVE = ("queued", "running")
+# secondes entre deux lectures de finished.json par un worker
+JOBS_POLL_INTERVAL = float(os.getenv("ETL_JOBS_POLL_INTERVAL", "1"))
+
+
+def _write(path, record):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _file_lock(path):
+    """Verrou exclusif entre processus (workers uvicorn), bloquant, libéré à la sortie du bloc."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _mark_finished(jobs_dir, job_id):
+    _write(os.path.join(jobs_dir, "finished.json"), {"id": job_id, "at": time.time()})
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class JobReporter:
+    """Côté processus du job: met à jour le fichier d'état à chaque étape (étapes parallèles possibles)."""
+
+    def __init__(self, path, record):
+        self.path = path
+        self.record = record
+        self.lock = threading.Lock()
+
+    def update(self, **fields):
+        with self.lock:
+            self.record.update(fields)
+            _write(self.path, self.record)
+
+    def start_stage(self, name):
+        with self.lock:
+            self.record["stages"].append({"name": name, "status": "running", "started_at": time.time()})
+            self._refresh()
+
+    def end_stage(self, name, status, **info):
+        with self.lock:
+            entry = next((s for s in self.record["stages"] if s["name"] == name), None)
+            if entry is None:
+                entry = {"name": name, "started_at": None}
+                self.record["stages"].append(entry)
+            if entry["started_at"] and "duration" not in info:
+                info["duration"] = round(time.time() - entry["started_at"], 3)
+            entry.update(info, status=status)
+            self._refresh()
+
+    def _refresh(self):
+        stages = self.record["stages"]
+        self.record["current_stages"] = [s["name"] for s in stages if s["status"] == "running"]
+        self.record["progress"]["done"] = sum(1 for s in stages if s["status"] in ("succeeded", "skipped"))
+        _write(self.path, self.record)
+
+    @contextmanager
+    def stage(self, name):
+        info = {}
+        self.start_stage(name)
+        try:
+            yield info
+        except BaseException as e:
+            self.end_stage(name, "failed", error=f"{type(e).__name__}: {e}", **info)
+            raise
+        self.end_stage(name, "succeeded", **info)
+
+
+def _summary_path(path):
+    return path[:-len(".json")] + ".summary.json"
+
+
+def _write_summary(reporter):
+    """Résumé JSON du run: statut, étapes et toutes les métriques collectées (metrics.REGISTRY)."""
+    record = reporter.record
+    summary = {
+        "id": record["id"], "status": record["status"], "params": record["params"],
+        "started_at": record["started_at"], "finished_at": record["finished_at"],
+        "duration": round(record["finished_at"] - record["started_at"], 3),
+        "stages": record["stages"], "error": record.get("error"),
+        "metrics": REGISTRY.snapshot(),
+    }
+    _write(_summary_path(reporter.path), summary)
+    _write(os.path.join(os.path.dirname(reporter.path), "last.json"), {"id": record["id"]})
+
+
+def _own_process_group():
+    """Fait du processus du job le chef d'un groupe: ses étapes (processus petits-enfants de
+    l'API) en héritent, et un SIGTERM reçu par le job est relayé à tout le groupe."""
+    if not hasattr(os, "setpgrp"):
+        return
+    os.setpgrp()
+
+    def forward(signum, frame):
+        signal.signal(signum, signal.SIG_DFL)
+        os.killpg(0, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+
+
+def _kill_group(pid):
+    """SIGTERM au groupe du job (job + étapes); False si le groupe n'existe pas (encore)."""
+    if not pid or not hasattr(os, "killpg"):
+        return False
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def _run_job(path, target, params):
+    """Point d'entrée du processus fils."""
+    _own_process_group()
+    reporter = JobReporter(path, _read(path))
+    reporter.update(status="running", pid=os.getpid(), started_at=time.time())
+    try:
+        module, func = target.split(":")
+        module = importlib.import_module(module)
+        reporter.record["progress"]["total"] = len(getattr(module, "STAGES", ())) or None
+        getattr(module, func)(report=reporter, **params)
+    except BaseException as e:
+        _finish(reporter, status="failed", finished_at=time.time(),
+                error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(limit=5))
+        raise SystemExit(1)
+    _finish(reporter, status="succeeded", finished_at=time.time())
+
+
+def _finish(reporter, **fields):
+    # le résumé est écrit avant le statut final: un job terminé a toujours son résumé
+    reporter.record.update(fields)
+    _write_summary(reporter)
+    reporter.update()
+    _mark_finished(os.path.dirname(reporter.path), reporter.record["id"])
+
+
+class JobManager:
+    def __init__(self, jobs_dir=JOBS_DIR, target=PIPELINE_TARGET, on_finish=None):
+        self.jobs_dir = jobs_dir
+        self.target = target
+        # appelé dans le processus de l'API à la fin de chaque job (ex: invalider le cache):
+        # par _watch dans le worker qui l'a lancé, par poll() dans les autres
+        self.on_finish = on_finish
+        self.processes = {}
+        self.lock = threading.Lock()
+        self.seen_finished = self.polled_at = None
+        # "spawn": le job ne reçoit ni les threads ni les connexions ouvertes de l'API
+        self.context = multiprocessing.get_context("spawn")
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def get(self, job_id):
+        if not job_id.isalnum():
+            return None
+        return _read(self._path(job_id))
+
+    def summary(self, job_id):
+        if not job_id.isalnum():
+            return None
+        return _read(_summary_path(self._path(job_id)))
+
+    def last_summary(self):
+        """Résumé du dernier job terminé (None si aucun)."""
+        last = _read(os.path.join(self.jobs_dir, "last.json"))
+        return last and self.summary(last["id"])
+
+    def active(self):
+        """Job en attente ou en cours (lancé par ce worker ou un autre), sinon None."""
+        current = _read(os.path.join(self.jobs_dir, "current.json"))
+        record = current and self.get(current["id"])
+        if not record or record["status"] not in ACTIVE:
+            return None
+        if record["status"] == "running" and not _alive(record.get("pid")):
+            return None
+        if record["status"] == "queued" and not _alive(current.get("owner")):
+            return None
+        return record
+
+    def submit(self, **params):
+        """Lance le pipeline; si un job est déjà actif, le retourne au lieu d'en lancer un second.
+
+        Le verrou de fichier rend la vérification et la réservation atomiques entre workers.
+        """
+        with self.lock, _file_lock(os.path.join(self.jobs_dir, "submit.lock")):
+            record = self.active()
+            if record is not None:
+                return record, False
+
+            job_id = uuid.uuid4().hex[:12]
+            record = {
+                "id": job_id, "status": "queued", "params": params, "created_at": time.time(),
+                "started_at": None, "finished_at": None, "pid": None, "current_stages": [],
+                "stages": [], "progress": {"done": 0, "total": None}, "error": None,
+            }
+            path = self._path(job_id)
+            _write(path, record)
+            _write(os.path.join(self.jobs_dir, "current.json"), {"id": job_id, "owner": os.getpid()})
+
+            process = self.context.Process(target=_run_job, args=(path, self.target, params), name=f"etl-{job_id}")
+            process.start()
+            self.processes[job_id] = process
+            threading.Thread(target=self._watch, args=(job_id, process), daemon=True).start()
+            return record, True
+
+    def _watch(self, job_id, process):
+        process.join()
+        with self.lock:
+            self.processes.pop(job_id, None)
+            record = self.get(job_id)
+            # processus tué (annulation, OOM...) avant d'avoir écrit son statut final
+            if record and record["status"] in ACTIVE:
+                record.update(status="failed", finished_at=time.time(),
+                              error=record.get("error") or f"worker exited with code {process.exitcode}")
+                _write(self._path(job_id), record)
+            # aussi pour un processus tué, qui n'a pas pu le signaler lui-même
+            _mark_finished(self.jobs_dir, job_id)
+            self.seen_finished = _read(os.path.join(self.jobs_dir, "finished.json"))
+        if self.on_finish is not None:
+            self.on_finish(record)
+
+    def poll(self):
+        """Appelle on_finish pour un job terminé depuis le dernier appel, quel que soit son worker.
+
+        Lit finished.json au plus une fois toutes les JOBS_POLL_INTERVAL secondes.
+        """
+        now = time.monotonic()
+        if self.on_finish is None or (self.polled_at is not None and now - self.polled_at < JOBS_POLL_INTERVAL):
+            return
+        first, self.polled_at = self.polled_at is None, now
+        marker = _read(os.path.join(self.jobs_dir, "finished.json"))
+        with self.lock:
+            previous, self.seen_finished = self.seen_finished, marker
+        # premier appel: simple point de départ (rien n'a encore pu être mis en cache)
+        if marker and not first and marker != previous:
+            self.on_finish(self.get(marker["id"]))
+
+    def cancel(self, job_id):
+        """Termine le job et les processus de ses étapes (même groupe de processus).
+
+        La transaction PostgreSQL d'une étape en cours est annulée avec sa connexion.
+        """
+        with self.lock:
+            record = self.get(job_id)
+            if record is None or record["status"] not in ACTIVE:
+                return record
+            process = self.processes.get(job_id)
+            pid = process.pid if process is not None else record.get("pid")
+            if not _kill_group(pid):
+                # pas encore chef de groupe: aucune étape n'a pu démarrer
+                if process is not None:
+                    process.terminate()
+                elif _alive(pid):
+                    os.kill(pid, signal.SIGTERM)
+            if process is not None:
+                process.join(5)
+            record = self.get(job_id)
+            record.update(status="cancelled", finished_at=time.time())
+            _write(self._path(job_id), record)
+            return record
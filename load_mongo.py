@@ -1,17 +1,40 @@
 import pandas as pd
+import pyarrow as pa
 import json
-from pymongo import MongoClient, UpdateOne, errors
+import hashlib
+from contextlib import contextmanager
+from pymongo import MongoClient, ReplaceOne, errors
 from dotenv import load_dotenv
 import os
 
+from metrics import DB_BATCH_SECONDS, ROWS
+from transform import as_tables
+
  
 load_dotenv()
 MONGO_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise ValueError("MONGO_URI/MONGODB_URI not found in .env file")
 
-client = MongoClient(MONGO_URI)
-mdb = client["nba"]
+# taille max d'un bulk_write et champ qui stocke l'empreinte du document
+BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
+HASH_FIELD = "_hash"
+DELETE_CHUNK_SIZE = int(os.getenv("MONGO_DELETE_CHUNK_SIZE", "10000"))
+# collections dont l'index unique est déjà vérifié dans ce processus
+_unique_indexes = set()
+
+# client créé au premier usage (get_db); `mdb` peut être remplacé (mongomock dans bench.py)
+client = None
+mdb = None
+
+
+def get_db():
+    global client, mdb
+    if mdb is None:
+        if not MONGO_URI:
+            raise ValueError("MONGO_URI/MONGODB_URI not found in .env file")
+        client = MongoClient(MONGO_URI)
+        mdb = client["nba"]
+    return mdb
+
 
 def player_to_dict(p):
     if isinstance(p, dict):
@@ -29,69 +52,161 @@ def player_to_dict(p):
 def stat_to_dict(s):
     return s.__dict__ if hasattr(s, "__dict__") else s
 
-def deduplicate_collection(coll, key: str = "id"):
- 
+def with_event_id(d):
+    # clé composite (joueur, événement) -> champ "id" unique comme les autres collections
+    d["id"] = f"{d['player_id']}:{d['event']}"
+    return d
+
+def deduplicate_collection(coll, key: str = "id", chunk_size: int = None):
+    """Une seule agrégation calcule tous les _id perdants; les suppressions partent par gros lots."""
+    chunk_size = chunk_size or DELETE_CHUNK_SIZE
     pipeline = [
         {"$match": {key: {"$ne": None}}},
-        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
-        {"$match": {"count": {"$gt": 1}}}
+        {"$group": {"_id": f"${key}", "keep": {"$first": "$_id"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        # احتفظ بالأول واحذف الباقي
+        {"$unwind": "$ids"},
+        {"$match": {"$expr": {"$ne": ["$ids", "$keep"]}}},
+        {"$project": {"_id": 0, "loser": "$ids"}},
     ]
-    duplicates = list(coll.aggregate(pipeline, allowDiskUse=True))
     removed = 0
-    for g in duplicates:
-        ids = g.get("ids", [])
-        to_delete = ids[1:]  # احتفظ بالأول واحذف الباقي
-        if to_delete:
-            res = coll.delete_many({"_id": {"$in": to_delete}})
-            removed += res.deleted_count
+    batch = []
+    for d in coll.aggregate(pipeline, allowDiskUse=True):
+        batch.append(d["loser"])
+        if len(batch) >= chunk_size:
+            removed += coll.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        removed += coll.delete_many({"_id": {"$in": batch}}).deleted_count
     if removed:
         print(f"🧹 Removed {removed} duplicated documents from {coll.name} on key '{key}'")
     return removed
 
-def load_mongo(players, stats):
-    players_dicts = [player_to_dict(p) for p in players]
-    stats_dicts   = [stat_to_dict(s) for s in stats]
- 
-    pd.DataFrame(players_dicts).to_csv("data/raw/players.csv", index=False)
-    pd.DataFrame(stats_dicts).to_csv("data/raw/stats.csv", index=False)
+def has_unique_index(coll, key: str = "id"):
+    return any(
+        info.get("unique") and [k for k, _ in info["key"]] == [key]
+        for info in coll.index_information().values()
+    )
+
+def ensure_unique_index(coll, key: str = "id"):
+    """Dédoublonne puis crée l'index unique, sauf si l'index existe déjà (aucun doublon possible)."""
+    marker = (coll.database.name, coll.name, key)
+    if marker in _unique_indexes:
+        return
+    if not has_unique_index(coll, key):
+        try:
+            deduplicate_collection(coll, key)
+        except Exception as e:
+            print(f"⚠️ Dedup warning: {e}")
+        coll.create_index(key, unique=True)
+    _unique_indexes.add(marker)
+
+def is_table(data):
+    return isinstance(data, (pa.Table, pa.RecordBatch, pd.DataFrame))
+
+
+def _to_docs(data, to_dict):
+    """Listes de dicts (ou objets) bruts, ou tables curated Arrow/DataFrame -> documents Mongo."""
+    if is_table(data):
+        docs = []
+        for table in as_tables(data):
+            # BSON ne connaît pas datetime.date: on garde l'ISO "YYYY-MM-DD"
+            table = table.cast(pa.schema([
+                pa.field(f.name, pa.string()) if pa.types.is_date(f.type) or pa.types.is_dictionary(f.type) else f
+                for f in table.schema
+            ]))
+            docs.extend(table.to_pylist())
+        return docs
+    return [to_dict(d) for d in data]
+
+
+def content_hash(doc):
+    """Empreinte stable du contenu d'un document (hors _id/_hash)."""
+    body = {k: v for k, v in doc.items() if k not in ("_id", HASH_FIELD)}
+    return hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
 
-    with open("data/raw/players.json", "w") as f:
-        json.dump(players_dicts, f, indent=2)
-    with open("data/raw/stats.json", "w") as f:
-        json.dump(stats_dicts, f, indent=2)
 
-  
+def existing_hashes(coll):
+    """Une seule requête de projection: {id: hash} pour toute la collection."""
+    return {d["id"]: d.get(HASH_FIELD) for d in coll.find({"id": {"$ne": None}}, {"_id": 0, "id": 1, HASH_FIELD: 1})}
+
+
+def _upsert(coll, docs, label, hashes):
+    """N'envoie que les documents nouveaux ou modifiés, par lots bornés. Retourne le nombre envoyé.
+
+    Le document est remplacé en entier: aucun champ d'une version précédente ne subsiste.
+    """
+    ops = []
+    sent = 0
+    for d in docs:
+        if d.get("id") is None:
+            continue
+        digest = content_hash(d)
+        if hashes.get(d["id"]) == digest:
+            continue
+        ops.append(ReplaceOne({"id": d["id"]}, dict(d, **{HASH_FIELD: digest}), upsert=True))
+        hashes[d["id"]] = digest
+        if len(ops) >= BATCH_SIZE:
+            sent += _bulk_write(coll, ops, label)
+            ops = []
+    if ops:
+        sent += _bulk_write(coll, ops, label)
+    return sent
+
+
+def _bulk_write(coll, ops, label):
     try:
-        deduplicate_collection(mdb.raw_players, "id")
-        deduplicate_collection(mdb.raw_stats, "id")
-    except Exception as e:
-        print(f"⚠️ Dedup warning: {e}")
+        with DB_BATCH_SECONDS.time(db="mongo", kind=coll.name):
+            coll.bulk_write(ops, ordered=False)
+    except errors.BulkWriteError as e:
+        print(f"⚠️ {label} bulk write warning: {e.details}")
+    return len(ops)
+
+
+@contextmanager
+def mongo_sink():
+    """Prépare les collections et retourne `sink(kind, data)`.
 
-   
+    Documents bruts de l'API: raw_players -> raw_players, raw_games -> raw_stats (tels quels).
+    Lignes curated (Parquet): players -> players, games -> games, player_events -> player_events.
+    """
+    mdb = get_db()
+    collections = {
+        "raw_players": (mdb.raw_players, player_to_dict, "Raw players"),
+        "raw_games": (mdb.raw_stats, stat_to_dict, "Raw stats"),
+        "players": (mdb.players, dict, "Players"),
+        "games": (mdb.games, dict, "Games"),
+        "player_events": (mdb.player_events, dict, "Player events"),
+    }
     try:
-        mdb.raw_players.create_index("id", unique=True)
-        mdb.raw_stats.create_index("id", unique=True)
+        for coll, _, _ in collections.values():
+            ensure_unique_index(coll, "id")
     except Exception as e:
         print(f"⚠️ Index creation warning: {e}")
- 
-    if players_dicts:
-        ops = [
-            UpdateOne({"id": d.get("id")}, {"$set": d}, upsert=True)
-            for d in players_dicts if d.get("id") is not None
-        ]
-        if ops:
-            try:
-                mdb.raw_players.bulk_write(ops, ordered=False)
-            except errors.BulkWriteError as e:
-                print(f"⚠️ Players bulk write warning: {e.details}")
-
-    if stats_dicts:
-        ops = [
-            UpdateOne({"id": d.get("id")}, {"$set": d}, upsert=True)
-            for d in stats_dicts if d.get("id") is not None
-        ]
-        if ops:
-            try:
-                mdb.raw_stats.bulk_write(ops, ordered=False)
-            except errors.BulkWriteError as e:
-                print(f"⚠️ Stats bulk write warning: {e.details}")
+
+    hashes = {}
+    counts = {"seen": 0, "sent": 0}
+
+    def sink(kind, data):
+        if kind in collections:
+            coll, to_dict, label = collections[kind]
+            if kind not in hashes:
+                hashes[kind] = existing_hashes(coll)
+            docs = _to_docs(data, to_dict)
+            if kind == "player_events":
+                docs = [with_event_id(d) for d in docs]
+            sent = _upsert(coll, docs, label, hashes[kind])
+            counts["seen"] += len(docs)
+            counts["sent"] += sent
+            ROWS.inc(len(docs), step="load_mongo", kind=kind, direction="in")
+            ROWS.inc(sent, step="load_mongo", kind=kind, direction="out")
+
+    yield sink
+    print(f"✅ MongoDB: {counts['sent']} new/changed documents written out of {counts['seen']}")
+
+
+def load_mongo(players, stats):
+    """Documents bruts de l'API -> raw_players / raw_stats; tables curated -> players / games."""
+    with mongo_sink() as sink:
+        sink("players" if is_table(players) else "raw_players", players)
+        sink("games" if is_table(stats) else "raw_games", stats)
@@ -1,85 +1,207 @@
 # load_pg_safe.py
+import os
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from models import SessionLocal, Player, Team, Game, Season
-
-def load_postgres(players, games):
- 
-    teams = {}
-    for p in players:
-        team = p.get("team")
-        if team and team.get("id") not in teams:
-            teams[team["id"]] = {
-                "id": team["id"],
-                "abbr": team.get("abbreviation", ""),
-                "name": team.get("full_name", "")
-            }
-
-    for g in games:
-        # home team
-        ht = g.get("home_team")
-        if ht and ht.get("id") not in teams:
-            teams[ht["id"]] = {
-                "id": ht["id"],
-                "abbr": ht.get("abbreviation", ""),
-                "name": ht.get("full_name", "")
-            }
-
-        # visitor team
-        vt = g.get("visitor_team")
-        if vt and vt.get("id") not in teams:
-            teams[vt["id"]] = {
-                "id": vt["id"],
-                "abbr": vt.get("abbreviation", ""),
-                "name": vt.get("full_name", "")
-            }
+
+from cache import get_response_cache
+from metrics import DB_BATCH_SECONDS, ROWS, BYTES_WRITTEN
+from models import SessionLocal, Player, Team, Game, Season, PlayerEventTotal
+from standings import refresh_team_season_stats
+from transform import transform_records, as_tables
+
+# "copy" (COPY -> staging -> upsert) ou "insert" (INSERT ... VALUES par lots)
+LOAD_MODE = os.getenv("PG_LOAD_MODE", "copy")
+CHUNK_SIZE = int(os.getenv("PG_LOAD_CHUNK_SIZE", "50000"))
+# limite de paramètres par requête côté PostgreSQL
+MAX_PARAMS = 65535
+
+COLUMNS = {
+    "teams": ["id", "abbr", "name"],
+    "players": ["id", "first", "last", "pos", "team_id"],
+    "games": ["id", "season", "date", "home_team_id", "visitor_team_id", "home_score", "visitor_score"],
+    "player_events": ["player_id", "event", "events", "total", "first_at", "last_at"],
+}
+MODELS = {"teams": Team, "players": Player, "games": Game, "player_events": PlayerEventTotal}
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS stg_teams (LIKE teams, ord serial) ON COMMIT DROP;
+CREATE TEMP TABLE IF NOT EXISTS stg_players (LIKE players, ord serial) ON COMMIT DROP;
+CREATE TEMP TABLE IF NOT EXISTS stg_games (LIKE games, ord serial) ON COMMIT DROP;
+CREATE TEMP TABLE IF NOT EXISTS stg_player_events (LIKE player_event_totals, ord serial) ON COMMIT DROP;
+"""
+
+# DISTINCT ON ... ord DESC: la dernière version d'une ligne dans le lot l'emporte
+MERGE_SQL = {
+    "teams": [
+        """
+        INSERT INTO teams (id, abbr, name)
+        SELECT DISTINCT ON (id) id, abbr, name FROM stg_teams ORDER BY id, ord DESC
+        ON CONFLICT (id) DO UPDATE SET abbr = EXCLUDED.abbr, name = EXCLUDED.name
+        WHERE (teams.abbr, teams.name) IS DISTINCT FROM (EXCLUDED.abbr, EXCLUDED.name)
+        """,
+    ],
+    "players": [
+        """
+        INSERT INTO players (id, first, last, pos, team_id)
+        SELECT DISTINCT ON (id) id, first, last, pos, team_id FROM stg_players ORDER BY id, ord DESC
+        ON CONFLICT (id) DO UPDATE SET first = EXCLUDED.first, last = EXCLUDED.last,
+            pos = EXCLUDED.pos, team_id = EXCLUDED.team_id
+        WHERE (players.first, players.last, players.pos, players.team_id)
+            IS DISTINCT FROM (EXCLUDED.first, EXCLUDED.last, EXCLUDED.pos, EXCLUDED.team_id)
+        """,
+    ],
+    "games": [
+        """
+        INSERT INTO seasons (year)
+        SELECT DISTINCT season FROM stg_games WHERE season IS NOT NULL
+        ON CONFLICT DO NOTHING
+        """,
+        """
+        INSERT INTO games (id, season, date, home_team_id, visitor_team_id, home_score, visitor_score)
+        SELECT DISTINCT ON (id) id, season, date, home_team_id, visitor_team_id, home_score, visitor_score
+        FROM stg_games ORDER BY id, ord DESC
+        ON CONFLICT (id) DO UPDATE SET season = EXCLUDED.season, date = EXCLUDED.date,
+            home_team_id = EXCLUDED.home_team_id, visitor_team_id = EXCLUDED.visitor_team_id,
+            home_score = EXCLUDED.home_score, visitor_score = EXCLUDED.visitor_score
+        WHERE (games.season, games.date, games.home_team_id, games.visitor_team_id, games.home_score, games.visitor_score)
+            IS DISTINCT FROM (EXCLUDED.season, EXCLUDED.date, EXCLUDED.home_team_id, EXCLUDED.visitor_team_id,
+                              EXCLUDED.home_score, EXCLUDED.visitor_score)
+        RETURNING season
+        """,
+    ],
+    # agrégats recalculés sur tout le fichier: la nouvelle valeur remplace l'ancienne
+    "player_events": [
+        """
+        INSERT INTO player_event_totals (player_id, event, events, total, first_at, last_at)
+        SELECT DISTINCT ON (player_id, event) player_id, event, events, total, first_at, last_at
+        FROM stg_player_events ORDER BY player_id, event, ord DESC
+        ON CONFLICT (player_id, event) DO UPDATE SET events = EXCLUDED.events, total = EXCLUDED.total,
+            first_at = EXCLUDED.first_at, last_at = EXCLUDED.last_at
+        WHERE (player_event_totals.events, player_event_totals.total, player_event_totals.first_at,
+               player_event_totals.last_at)
+            IS DISTINCT FROM (EXCLUDED.events, EXCLUDED.total, EXCLUDED.first_at, EXCLUDED.last_at)
+        """,
+    ],
+}
+
+# saisons quittées par des matchs du lot (l'upsert ne renvoie que la nouvelle saison)
+MOVED_SEASONS_SQL = """
+SELECT DISTINCT g.season FROM games g JOIN stg_games s ON s.id = g.id
+WHERE g.season IS NOT NULL AND g.season IS DISTINCT FROM s.season
+"""
+
+
+def _prepare(kind, table):
+    """Colonnes de la table cible, au format attendu par PostgreSQL."""
+    arrays = []
+    for name in COLUMNS[kind]:
+        col = table.column(name)
+        if pa.types.is_dictionary(col.type):
+            col = col.cast(pa.string())
+        if name in ("home_score", "visitor_score"):
+            col = pc.fill_null(col, 0)
+        arrays.append(col)
+    return pa.Table.from_arrays(arrays, names=COLUMNS[kind])
+
+
+def _copy(cur, kind, table):
+    """COPY du lot en staging puis upsert; retourne les saisons dont des matchs ont changé."""
+    buf = pa.BufferOutputStream()
+    pacsv.write_csv(table, buf)
+    data = buf.getvalue().to_pybytes()
+    columns = ", ".join(table.column_names)
+    with cur.copy(f"COPY stg_{kind} ({columns}) FROM STDIN (FORMAT csv, HEADER true)") as copy:
+        copy.write(data)
+    BYTES_WRITTEN.inc(len(data), target="postgres_copy")
+    seasons = set()
+    if kind == "games":
+        cur.execute(MOVED_SEASONS_SQL)
+        seasons.update(r[0] for r in cur.fetchall())
+    for sql in MERGE_SQL[kind]:
+        cur.execute(sql)
+    # la dernière requête est l'upsert de la table cible: lignes insérées ou réellement modifiées
+    ROWS.inc(max(cur.rowcount, 0), step="load_postgres", kind=kind, direction="out")
+    if kind == "games":
+        seasons.update(r[0] for r in cur.fetchall())
+    cur.execute(f"TRUNCATE stg_{kind}")
+    return seasons
+
+
+def _insert(sess, kind, table):
+    rows = table.to_pylist()
+    if kind != "games":
+        sess.execute(pg_insert(MODELS[kind]).values(rows).on_conflict_do_nothing())
+        return set()
+    seasons = {r["season"] for r in rows if r["season"] is not None}
+    if seasons:
+        sess.execute(pg_insert(Season).values([{"year": y} for y in sorted(seasons)]).on_conflict_do_nothing())
+    inserted = sess.execute(pg_insert(Game).values(rows).on_conflict_do_nothing().returning(Game.season))
+    return set(inserted.scalars())
+
+
+@contextmanager
+def postgres_sink(mode=None, chunk_size=None):
+    """Ouvre une transaction et retourne `sink(kind, table)`; commit à la sortie du bloc."""
+    mode = mode or LOAD_MODE
+    chunk_size = chunk_size or CHUNK_SIZE
+    counts = dict.fromkeys(COLUMNS, 0)
+    seasons = set()
 
     # --- تحميل البيانات ---
     with SessionLocal() as sess:
-        # تحميل الفرق
-        sess.execute(
-            pg_insert(Team)
-            .values(list(teams.values()))
-            .on_conflict_do_nothing()
-        )
- 
-        sess.execute(
-            pg_insert(Player)
-            .values([
-                {
-                    "id": p.get("id"),
-                    "first": p.get("first_name", ""),
-                    "last": p.get("last_name", ""),
-                    "pos": p.get("position"),
-                    "team_id": p["team"]["id"] if p.get("team") else None
-                } for p in players
-            ])
-            .on_conflict_do_nothing()
-        )
-
-       
-        sess.execute(
-            pg_insert(Season)
-            .values([{"year": 2023}])
-            .on_conflict_do_nothing()
-        )
-
-    
-        sess.execute(
-            pg_insert(Game)
-            .values([
-                {
-                    "id": g.get("id"),
-                    "season": g.get("season"),
-                    "date": g.get("date", ""),
-                    "home_team_id": g["home_team"]["id"] if g.get("home_team") else None,
-                    "visitor_team_id": g["visitor_team"]["id"] if g.get("visitor_team") else None,
-                    "home_score": g.get("home_team_score") or 0,
-                    "visitor_score": g.get("visitor_team_score") or 0,
-                } for g in games
-            ])
-            .on_conflict_do_nothing()
-        )
-
-        
+        cur = None
+        if mode == "copy":
+            cur = sess.connection().connection.driver_connection.cursor()
+            cur.execute(STAGING_DDL)
+
+        def sink(kind, data):
+            for table in as_tables(data):
+                table = _prepare(kind, table)
+                size = chunk_size if mode == "copy" else max(1, min(chunk_size, MAX_PARAMS // table.num_columns))
+                for offset in range(0, table.num_rows, size):
+                    chunk = table.slice(offset, size)
+                    with DB_BATCH_SECONDS.time(db="postgres", kind=kind):
+                        if cur is not None:
+                            seasons.update(_copy(cur, kind, chunk))
+                        else:
+                            seasons.update(_insert(sess, kind, chunk))
+                counts[kind] += table.num_rows
+                ROWS.inc(table.num_rows, step="load_postgres", kind=kind, direction="in")
+
+        yield sink
+
+        # classements des seules saisons touchées, visibles en même temps que les matchs
+        refreshed = refresh_team_season_stats(sess, seasons)
+        ROWS.inc(refreshed, step="load_postgres", kind="team_season_stats", direction="out")
+
+        # transaction unique pour tous les lots
         sess.commit()
-        print(f"✅ Loaded {len(players)} players and {len(games)} games into PostgreSQL")
+        # les réponses en cache de l'API ne reflètent plus la base
+        get_response_cache().invalidate()
+        print(f"✅ Loaded {counts['teams']} teams, {counts['players']} players and {counts['games']} games into PostgreSQL ({mode})")
+        if seasons:
+            print(f"🏆 Standings refreshed for seasons {sorted(s for s in seasons if s is not None)}")
+        if counts["player_events"]:
+            print(f"✅ Loaded {counts['player_events']} player/event totals into PostgreSQL ({mode})")
+
+
+def _is_raw(data):
+    return isinstance(data, list) and bool(data) and isinstance(data[0], dict)
+
+
+def load_postgres(players=None, games=None, teams=None, mode=None, chunk_size=None):
+    """Charge des tables curated (Arrow/DataFrame) ou, à défaut, des listes de dicts bruts de l'API."""
+    if _is_raw(players) or _is_raw(games):
+        stream = transform_records(players or [], games or [])
+    else:
+        stream = [("teams", t) for t in as_tables(teams)] + \
+                 [("players", t) for t in as_tables(players)] + \
+                 [("games", t) for t in as_tables(games)]
+
+    with postgres_sink(mode, chunk_size) as sink:
+        for kind, table in stream:
+            sink(kind, table)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test de charge des endpoints de lecture: N clients concurrents, latences p50/p95/p99 en JSON.
+
+    uvicorn main:app --workers 1 &
+    python loadtest.py --url http://localhost:8000 --clients 300 --requests 20
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PATHS = [
+    "/players?size=20",
+    "/teams",
+    "/games?size=20&count=none",
+    "/games?season=2023&size=20",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    k = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+def client(url, n, headers, barrier, latencies, errors):
+    session = requests.Session()
+    barrier.wait()
+    for i in range(n):
+        path = PATHS[i % len(PATHS)]
+        start = time.perf_counter()
+        try:
+            r = session.get(url + path, headers=headers, timeout=60)
+            ok = r.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors.append(path)
+
+
+def run(url, clients, n, api_key=None):
+    headers = {"X-API-Key": api_key} if api_key else {}
+    latencies, errors = [], []
+    barrier = threading.Barrier(clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client, url, n, headers, barrier, latencies, errors)
+    wall = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=20, help="requêtes par client")
+    args = parser.parse_args()
+    print(json.dumps(run(args.url.rstrip("/"), args.clients, args.requests, os.getenv("PUBLIC_API_KEY")), indent=2))
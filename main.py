@@ -1,31 +1,47 @@
-from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, status
-from sqlalchemy import or_
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
+from sqlalchemy import or_, select, func
+from sqlalchemy.orm import joinedload
+from typing import Literal
 from dotenv import load_dotenv
+import json
 import os
+import time
 
-from extract_api import run_api
-from extract_web import run_web
-from extract_csv import run_csv
-from extract_sql import run_sql
-from extract_big import run_big
-from load_pg import load_postgres
-from load_mongo import load_mongo
-from transform import run_transform
-from models import SessionLocal, Player, Team, Game, Season
+from cache import get_response_cache
+from jobs import JobManager
+from metrics import REGISTRY, REQUEST_SECONDS
+from models import AsyncSessionLocal, Player, Team, Game, Season, TeamSeasonStat
 
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 
 load_dotenv()
 PUBLIC_API_KEY = os.getenv("PUBLIC_API_KEY")
+# nombre max d'ids par requête POST /players/batch et /games/batch
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))
 
 app = FastAPI(title="NBA ETL Runner")
 
-def verify_api_key(x_api_key: str = Header(default=None)):
+async def verify_api_key(x_api_key: str = Header(default=None)):
     # إذا تم ضبط PUBLIC_API_KEY في .env، فعّل التحقق
     if PUBLIC_API_KEY and x_api_key != PUBLIC_API_KEY:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing API key")
     return True
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # étiquette = chemin déclaré (/etl/jobs/{job_id}), pas l'URL: cardinalité bornée
+    endpoint = request.scope.get("endpoint")
+    route = next((r.path for r in app.routes if getattr(r, "endpoint", None) is endpoint), "unmatched") \
+        if endpoint else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route,
+                            status=response.status_code)
+    return response
+
 # تهيئة قاعدة البيانات عند الإقلاع (إن لزم)
 @app.on_event("startup")
 def on_startup():
@@ -35,72 +51,251 @@ def on_startup():
     except Exception as e:
         print(f"⚠️ DB init skipped: {e}")
 
-def full_pipeline():
-    players, stats = run_api()
-    run_web()
-    run_csv()
-    run_sql()
-    run_big()
-
-    # خطوة التحويل (تطبيع/تنظيف وكتابة ملفات جاهزة)
-    run_transform()
-
-    load_postgres(players, stats)
-    load_mongo(players, stats)
-    print("Full ETL pipeline finished")
+# le pipeline (pipeline.full_pipeline) tourne dans un processus dédié, un seul job à la fois;
+# le chargement invalide le cache de ce processus-là, d'où l'invalidation ici en fin de job
+# (dans chaque worker: etl_jobs.poll, appelé à chaque lecture du cache)
+etl_jobs = JobManager(on_finish=lambda job: get_response_cache().invalidate())
 
 # استبدل تعريف POST الأحادي بهذا التعريف متعدد الطرق
 @app.api_route("/run-etl", methods=["POST", "GET"])
-def trigger(background_tasks: BackgroundTasks, _: bool = Depends(verify_api_key)):
-    background_tasks.add_task(full_pipeline)
-    return {"status": "ETL started in background"}
+def trigger(full_refresh: bool = False, _: bool = Depends(verify_api_key)):
+    job, created = etl_jobs.submit(incremental=not full_refresh)
+    status_msg = "ETL started in background" if created else "ETL already running"
+    return {"status": status_msg, "job_id": job["id"], "job_url": f"/etl/jobs/{job['id']}"}
+
+@app.get("/etl/jobs/{job_id}")
+def get_job(job_id: str, _: bool = Depends(verify_api_key)):
+    job = etl_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/etl/jobs/{job_id}/summary")
+def get_job_summary(job_id: str, _: bool = Depends(verify_api_key)):
+    summary = etl_jobs.summary(job_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not found (job unknown or still running)")
+    return summary
+
+@app.delete("/etl/jobs/{job_id}")
+def cancel_job(job_id: str, _: bool = Depends(verify_api_key)):
+    job = etl_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 # ---- Endpoints القراءة (GET) مع ترقيم وتصفية ----
 
-def player_to_dict(p: Player):
-    return {"id": p.id, "first": p.first, "last": p.last, "pos": p.pos, "team_id": p.team_id}
+# total: "exact" (COUNT), "estimate" (planner) ou "none"
+CountMode = Literal["exact", "estimate", "none"]
+# expand=teams: objets équipe inclus dans la réponse (chargés par jointure, même requête)
+Expand = Literal["teams"]
+
+# relations chargées avec les lignes quand expand=teams (many-to-one: LEFT JOIN, pas de N+1)
+EXPAND_TEAMS = {
+    Player: [joinedload(Player.team)],
+    Game: [joinedload(Game.home_team), joinedload(Game.visitor_team)],
+}
+
+class BatchRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=BATCH_MAX_IDS)
+    expand: Expand | None = None
+
+def player_to_dict(p: Player, expand: str | None = None):
+    d = {"id": p.id, "first": p.first, "last": p.last, "pos": p.pos, "team_id": p.team_id}
+    if expand == "teams":
+        d["team"] = team_to_dict(p.team) if p.team else None
+    return d
 
 def team_to_dict(t: Team):
     return {"id": t.id, "abbr": t.abbr, "name": t.name}
 
-def game_to_dict(g: Game):
-    return {
+def game_to_dict(g: Game, expand: str | None = None):
+    d = {
         "id": g.id, "season": g.season, "date": g.date,
         "home_team_id": g.home_team_id, "visitor_team_id": g.visitor_team_id,
         "home_score": g.home_score, "visitor_score": g.visitor_score
     }
+    if expand == "teams":
+        d["home_team"] = team_to_dict(g.home_team) if g.home_team else None
+        d["visitor_team"] = team_to_dict(g.visitor_team) if g.visitor_team else None
+    return d
+
+def team_stat_to_dict(s: TeamSeasonStat):
+    return {
+        "season": s.season, "team_id": s.team_id, "games": s.games, "wins": s.wins, "losses": s.losses,
+        "win_pct": round(s.wins / s.games, 3) if s.games else None,
+        "points_for": s.points_for, "points_against": s.points_against,
+        "point_diff": s.points_for - s.points_against,
+        "home": {"wins": s.home_wins, "losses": s.home_losses},
+        "away": {"wins": s.away_wins, "losses": s.away_losses},
+    }
+
+async def estimate_count(sess, stmt):
+    """Nombre de lignes estimé par le planner PostgreSQL (EXPLAIN), sans parcourir la table.
+
+    Les valeurs (ex. `q`) partent en paramètres du driver, jamais dans le texte SQL.
+    """
+    compiled = stmt.compile(dialect=sess.bind.dialect, compile_kwargs={"render_postcompile": True})
+    conn = await sess.connection()
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+async def count_rows(sess, stmt, mode: str):
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        return await estimate_count(sess, stmt)
+    return await sess.scalar(select(func.count()).select_from(stmt.subquery()))
+
+async def paginate(sess, stmt, model, page: int, size: int, after_id: int | None, count: str, options=()):
+    """Pagination par offset (page) ou par curseur (after_id: WHERE id > after_id, temps constant).
+
+    `options` (chargement des relations) ne s'applique qu'à la page, pas au comptage.
+    """
+    total = await count_rows(sess, stmt, count)
+    stmt = stmt.options(*options).order_by(model.id)
+    if after_id is not None:
+        stmt = stmt.where(model.id > after_id).limit(size)
+    else:
+        stmt = stmt.offset((page - 1) * size).limit(size)
+    items = (await sess.scalars(stmt)).all()
+    next_cursor = items[-1].id if len(items) == size else None
+    return items, total, next_cursor
+
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+async def _cache_call(fn, *args):
+    # backend bloquant (sqlite): exécuté dans le pool de threads, pas dans la boucle asyncio
+    if get_response_cache().blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+def _cache_lookup(key):
+    # job terminé dans un autre worker: son on_finish (invalidation) s'applique ici aussi
+    etl_jobs.poll()
+    cache = get_response_cache()
+    entry = cache.get(key)
+    return entry, (cache.version if entry is None else None)
+
+async def cached_response(request: Request, build):
+    """Sert la réponse depuis le cache (clé: chemin + paramètres), avec ETag / 304 Not Modified."""
+    key = request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    entry, version = await _cache_call(_cache_lookup, key)
+    if entry is None:
+        body = json.dumps(jsonable_encoder(await build()), separators=(",", ":")).encode()
+        entry = await _cache_call(get_response_cache().set, key, body, version)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
 @app.get("/players")
-def get_players(team_id: int | None = None, q: str | None = None, page: int = 1, size: int = 20, _: bool = Depends(verify_api_key)):
-    with SessionLocal() as sess:
-        query = sess.query(Player)
+async def get_players(request: Request, team_id: int | None = None, q: str | None = None, page: int = 1, size: int = 20,
+                      after_id: int | None = None, count: CountMode = "exact", expand: Expand | None = None,
+                      _: bool = Depends(verify_api_key)):
+    return await cached_response(request, lambda: _players(team_id, q, page, size, after_id, count, expand))
+
+async def _players(team_id, q, page, size, after_id, count, expand=None):
+    async with AsyncSessionLocal() as sess:
+        stmt = select(Player)
         if team_id is not None:
-            query = query.filter(Player.team_id == team_id)
+            stmt = stmt.where(Player.team_id == team_id)
         if q:
-            query = query.filter(or_(Player.first.ilike(f"%{q}%"), Player.last.ilike(f"%{q}%")))
-        total = query.count()
-        items = query.offset((page - 1) * size).limit(size).all()
-        return {"items": [player_to_dict(p) for p in items], "page": page, "size": size, "total": total}
+            stmt = stmt.where(or_(Player.first.ilike(f"%{q}%"), Player.last.ilike(f"%{q}%")))
+        options = EXPAND_TEAMS[Player] if expand == "teams" else ()
+        items, total, next_cursor = await paginate(sess, stmt, Player, page, size, after_id, count, options)
+        return {"items": [player_to_dict(p, expand) for p in items], "page": page, "size": size, "total": total,
+                "next_cursor": next_cursor}
 
 @app.get("/teams")
-def get_teams(page: int = 1, size: int = 50, _: bool = Depends(verify_api_key)):
-    with SessionLocal() as sess:
-        query = sess.query(Team)
-        total = query.count()
-        items = query.offset((page - 1) * size).limit(size).all()
+async def get_teams(request: Request, page: int = 1, size: int = 50, _: bool = Depends(verify_api_key)):
+    return await cached_response(request, lambda: _teams(page, size))
+
+async def _teams(page, size):
+    async with AsyncSessionLocal() as sess:
+        items, total, _next = await paginate(sess, select(Team), Team, page, size, None, "exact")
         return {"items": [team_to_dict(t) for t in items], "page": page, "size": size, "total": total}
 
 @app.get("/games")
-def get_games(season: int | None = None, team_id: int | None = None, page: int = 1, size: int = 20, _: bool = Depends(verify_api_key)):
-    with SessionLocal() as sess:
-        query = sess.query(Game)
+async def get_games(request: Request, season: int | None = None, team_id: int | None = None, page: int = 1, size: int = 20,
+                    after_id: int | None = None, count: CountMode = "exact", expand: Expand | None = None,
+                    _: bool = Depends(verify_api_key)):
+    return await cached_response(request, lambda: _games(season, team_id, page, size, after_id, count, expand))
+
+async def _games(season, team_id, page, size, after_id, count, expand=None):
+    async with AsyncSessionLocal() as sess:
+        stmt = select(Game)
         if season is not None:
-            query = query.filter(Game.season == season)
+            stmt = stmt.where(Game.season == season)
         if team_id is not None:
-            query = query.filter(or_(Game.home_team_id == team_id, Game.visitor_team_id == team_id))
-        total = query.count()
-        items = query.offset((page - 1) * size).limit(size).all()
-        return {"items": [game_to_dict(g) for g in items], "page": page, "size": size, "total": total}
+            stmt = stmt.where(or_(Game.home_team_id == team_id, Game.visitor_team_id == team_id))
+        options = EXPAND_TEAMS[Game] if expand == "teams" else ()
+        items, total, next_cursor = await paginate(sess, stmt, Game, page, size, after_id, count, options)
+        return {"items": [game_to_dict(g, expand) for g in items], "page": page, "size": size, "total": total,
+                "next_cursor": next_cursor}
+
+# ---- lectures groupées: beaucoup d'ids en une requête HTTP et une requête SQL ----
+
+async def fetch_batch(model, ids, expand):
+    """Lignes de `model` pour `ids` (dans l'ordre demandé, sans doublon) et ids introuvables."""
+    ids = list(dict.fromkeys(ids))
+    async with AsyncSessionLocal() as sess:
+        stmt = select(model).where(model.id.in_(ids))
+        if expand == "teams":
+            stmt = stmt.options(*EXPAND_TEAMS[model])
+        found = {row.id: row for row in (await sess.scalars(stmt)).all()}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+@app.post("/players/batch")
+async def get_players_batch(body: BatchRequest, _: bool = Depends(verify_api_key)):
+    items, missing = await fetch_batch(Player, body.ids, body.expand)
+    return {"items": [player_to_dict(p, body.expand) for p in items], "missing": missing}
+
+@app.post("/games/batch")
+async def get_games_batch(body: BatchRequest, _: bool = Depends(verify_api_key)):
+    items, missing = await fetch_batch(Game, body.ids, body.expand)
+    return {"items": [game_to_dict(g, body.expand) for g in items], "missing": missing}
+
+# ---- classements: agrégats matérialisés (team_season_stats, voir standings.py) ----
+
+@app.get("/standings")
+async def get_standings(request: Request, season: int | None = None, _: bool = Depends(verify_api_key)):
+    return await cached_response(request, lambda: _standings(season))
+
+async def _standings(season):
+    async with AsyncSessionLocal() as sess:
+        if season is None:
+            # dernière saison: lecture en bout d'index (clé primaire season, team_id)
+            season = await sess.scalar(select(func.max(TeamSeasonStat.season)))
+        stmt = (select(TeamSeasonStat, Team).join(Team, Team.id == TeamSeasonStat.team_id)
+                .where(TeamSeasonStat.season == season)
+                .order_by((TeamSeasonStat.wins * 1.0 / TeamSeasonStat.games).desc(),
+                          TeamSeasonStat.wins.desc(), TeamSeasonStat.team_id))
+        rows = (await sess.execute(stmt)).all()
+        return {"season": season,
+                "items": [dict(team_stat_to_dict(s), rank=i + 1, abbr=t.abbr, name=t.name)
+                          for i, (s, t) in enumerate(rows)]}
+
+@app.get("/teams/{team_id}/summary")
+async def get_team_summary(request: Request, team_id: int, _: bool = Depends(verify_api_key)):
+    return await cached_response(request, lambda: _team_summary(team_id))
+
+async def _team_summary(team_id):
+    async with AsyncSessionLocal() as sess:
+        stmt = (select(Team, TeamSeasonStat).outerjoin(TeamSeasonStat, TeamSeasonStat.team_id == Team.id)
+                .where(Team.id == team_id).order_by(TeamSeasonStat.season.desc()))
+        rows = (await sess.execute(stmt)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Team not found")
+    seasons = [team_stat_to_dict(s) for _t, s in rows if s is not None]
+    totals = {k: sum(s[k] for s in seasons) for k in ("games", "wins", "losses", "points_for", "points_against")}
+    return dict(team_to_dict(rows[0][0]), seasons=seasons, totals=totals)
 
 @app.get("/", include_in_schema=False)
 def index():
@@ -110,6 +305,17 @@ def index():
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["meta"], summary="Métriques Prometheus (API + dernier run ETL)")
+def metrics():
+    last = etl_jobs.last_summary()
+    body = REGISTRY.render(last["metrics"]) if last else REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats", tags=["meta"], summary="Compteurs du cache de réponses")
+def cache_stats(_: bool = Depends(verify_api_key)):
+    # hits/misses sont propres au worker (pid); version et entrées sont partagées avec le backend sqlite
+    return dict(get_response_cache().stats(), pid=os.getpid())
+
 
 
 # Ajout dans main.py après les autres endpoints
@@ -0,0 +1,189 @@
+# metrics.py
+"""Métriques du pipeline et de l'API, au format texte Prometheus (sans dépendance).
+
+Les étapes du pipeline tournent dans d'autres processus: elles renvoient un
+`snapshot()` que l'orchestrateur fusionne (`merge`), puis le job l'écrit dans son
+résumé JSON; /metrics expose l'API et le dernier run ETL.
+"""
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {json.dumps(k): self._copy(v) for k, v in self.samples.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.samples.items()):
+                lines.extend(self._render(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def empty(self):
+        return Counter(self.name, self.help, self.labelnames)
+
+    def value(self, **labels):
+        return self.samples.get(self._key(labels), 0)
+
+    def _copy(self, value):
+        return value
+
+    def _merge(self, key, value):
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    def _render(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def empty(self):
+        return Histogram(self.name, self.help, self.labelnames, self.buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            index = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+            sample["counts"][index] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _copy(self, value):
+        return {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+
+    def _merge(self, key, value):
+        sample = self.samples.setdefault(key, {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+        sample["counts"] = [a + b for a, b in zip(sample["counts"], value["counts"])]
+        sample["sum"] += value["sum"]
+        sample["count"] += value["count"]
+
+    def _render(self, key, value):
+        lines, total = [], 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], value["counts"]):
+            total += count
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {total}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {value['sum']}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {value['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self):
+        return {name: m.snapshot() for name, m in self.metrics.items()}
+
+    def merge(self, snapshot):
+        """Ajoute les valeurs d'un snapshot (ex: venu d'un processus d'étape)."""
+        for name, samples in (snapshot or {}).items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            with metric.lock:
+                for key, value in samples.items():
+                    metric._merge(tuple(json.loads(key)), value)
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def render(self, *snapshots):
+        """Texte Prometheus de ce registre, plus les snapshots donnés (ex: dernier run ETL)."""
+        if snapshots:
+            combined = Registry()
+            for metric in self.metrics.values():
+                combined._add(metric.empty())
+            for snapshot in (self.snapshot(),) + snapshots:
+                combined.merge(snapshot)
+            return combined.render()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- pipeline ETL ----
+STAGE_SECONDS = REGISTRY.histogram("etl_stage_duration_seconds", "Durée des étapes du pipeline", ["stage", "status"])
+STAGE_RUNS = REGISTRY.counter("etl_stage_runs_total", "Étapes terminées, par statut", ["stage", "status"])
+ROWS = REGISTRY.counter("etl_rows_total", "Lignes lues (in) ou produites/écrites (out) par étape", ["step", "kind", "direction"])
+BYTES_WRITTEN = REGISTRY.counter("etl_bytes_written_total", "Octets écrits, par cible", ["target"])
+HTTP_REQUESTS = REGISTRY.counter("etl_http_requests_total", "Requêtes HTTP d'extraction, par code", ["endpoint", "status"])
+HTTP_RETRIES = REGISTRY.counter("etl_http_retries_total", "Tentatives HTTP rejouées (429, erreurs)", ["endpoint", "reason"])
+DB_BATCH_SECONDS = REGISTRY.histogram("etl_db_batch_duration_seconds", "Latence d'un lot écrit en base", ["db", "kind"])
+
+# ---- API ----
+REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "Latence des requêtes de l'API",
+                                     ["method", "route", "status"])
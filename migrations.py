@@ -0,0 +1,132 @@
+# migrations.py
+"""Migrations de schéma versionnées, appliquées dans l'ordre par init_db().
+
+Chaque migration est une fonction `(conn)` exécutée dans sa propre transaction;
+sa version est enregistrée dans `schema_migrations` une fois appliquée.
+Une migration peut retourner False pour être retentée au prochain démarrage.
+"""
+from sqlalchemy import text
+
+MIGRATIONS = []
+
+
+def migration(version):
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+
+@migration("0001_baseline")
+def baseline(conn):
+    # schéma d'origine (ex-create_all); IF NOT EXISTS pour adopter les bases existantes
+    for sql in [
+        "CREATE TABLE IF NOT EXISTS teams (id INTEGER PRIMARY KEY, abbr VARCHAR NOT NULL, name VARCHAR NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS seasons (year INTEGER PRIMARY KEY)",
+        """CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY, first VARCHAR, last VARCHAR, pos VARCHAR,
+            team_id INTEGER REFERENCES teams (id))""",
+        """CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY, season INTEGER REFERENCES seasons (year), date VARCHAR,
+            home_team_id INTEGER REFERENCES teams (id), visitor_team_id INTEGER REFERENCES teams (id),
+            home_score INTEGER, visitor_score INTEGER)""",
+    ]:
+        conn.execute(text(sql))
+
+
+@migration("0002_games_date_and_filter_indexes")
+def games_date_and_filter_indexes(conn):
+    conn.execute(text("""
+        ALTER TABLE games ALTER COLUMN date TYPE DATE
+        USING NULLIF(substring(date::text from 1 for 10), '')::date
+    """))
+    for sql in [
+        "CREATE INDEX IF NOT EXISTS ix_games_season_id ON games (season, id)",
+        "CREATE INDEX IF NOT EXISTS ix_games_home_team_id_season ON games (home_team_id, season)",
+        "CREATE INDEX IF NOT EXISTS ix_games_visitor_team_id_season ON games (visitor_team_id, season)",
+        "CREATE INDEX IF NOT EXISTS ix_players_team_id_id ON players (team_id, id)",
+    ]:
+        conn.execute(text(sql))
+
+
+@migration("0003_players_name_trgm")
+def players_name_trgm(conn):
+    available = conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar()
+    if not available:
+        print("⚠️ pg_trgm is not available on this server: name search indexes skipped")
+        return False
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_players_first_trgm ON players USING gin (first gin_trgm_ops)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_players_last_trgm ON players USING gin (last gin_trgm_ops)"))
+
+
+@migration("0004_player_event_totals")
+def player_event_totals(conn):
+    # agrégats de extract_big.aggregate_big (ids de joueurs propres au flux: pas de FK)
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS player_event_totals (
+            player_id INTEGER NOT NULL, event VARCHAR NOT NULL,
+            events BIGINT NOT NULL, total BIGINT NOT NULL,
+            first_at TIMESTAMP, last_at TIMESTAMP,
+            PRIMARY KEY (player_id, event))
+    """))
+
+
+@migration("0005_team_season_stats")
+def team_season_stats(conn):
+    # agrégats matérialisés (standings.py), tenus à jour par load_pg après chaque chargement
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS team_season_stats (
+            season INTEGER NOT NULL REFERENCES seasons (year), team_id INTEGER NOT NULL REFERENCES teams (id),
+            games INTEGER NOT NULL, wins INTEGER NOT NULL, losses INTEGER NOT NULL,
+            points_for BIGINT NOT NULL, points_against BIGINT NOT NULL,
+            home_wins INTEGER NOT NULL, home_losses INTEGER NOT NULL,
+            away_wins INTEGER NOT NULL, away_losses INTEGER NOT NULL,
+            PRIMARY KEY (season, team_id))
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_team_season_stats_team_id_season ON team_season_stats (team_id, season)"))
+    # première construction à partir des matchs déjà chargés; copie figée de standings.REFRESH_SQL
+    # au moment de cette migration (le module peut évoluer avec le schéma, pas cette version)
+    conn.execute(text("DELETE FROM team_season_stats"))
+    conn.execute(text("""
+        INSERT INTO team_season_stats (season, team_id, games, wins, losses, points_for, points_against,
+                                       home_wins, home_losses, away_wins, away_losses)
+        SELECT season, team_id, count(*), count(*) FILTER (WHERE win), count(*) FILTER (WHERE NOT win),
+               sum(points_for), sum(points_against),
+               count(*) FILTER (WHERE home AND win), count(*) FILTER (WHERE home AND NOT win),
+               count(*) FILTER (WHERE NOT home AND win), count(*) FILTER (WHERE NOT home AND NOT win)
+        FROM (
+            SELECT season, home_team_id AS team_id, true AS home, home_score AS points_for,
+                   visitor_score AS points_against, home_score > visitor_score AS win
+            FROM games WHERE home_score <> visitor_score
+            UNION ALL
+            SELECT season, visitor_team_id, false, visitor_score, home_score, visitor_score > home_score
+            FROM games WHERE home_score <> visitor_score
+        ) sides
+        WHERE season IS NOT NULL AND team_id IS NOT NULL
+        GROUP BY season, team_id
+    """))
+
+
+def applied_versions(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())
+    """))
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def migrate(engine):
+    applied = []
+    for version, fn in MIGRATIONS:
+        with engine.begin() as conn:
+            # un seul worker migre à la fois
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+            if version in applied_versions(conn):
+                continue
+            if fn(conn) is False:
+                continue
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+            applied.append(version)
+            print(f"✅ Applied migration {version}")
+    return applied
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Faux serveur balldontlie local: /players et /games paginés (page, per_page), hors réseau.
+
+Données de fake_data.py (déterministes), avec injection de latence, de 429 (Retry-After)
+et de 5xx pour mesurer la concurrence, le backoff et le débit de PageFetcher:
+
+    python mock_api.py --port 8099 --players 5000 --games 50000 --latency 0.05 --p429 0.05 --p5xx 0.02
+    BALLDONTLIE_BASE_URL=http://127.0.0.1:8099/v1 python -c "from extract_api import run_api; run_api()"
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from fake_data import fake_players, fake_games
+
+
+class MockBalldontlie:
+    """Serveur HTTP dans un thread; `stats` compte les réponses servies, 429 et 5xx.
+
+    rate_limit: requêtes/s acceptées avant de répondre 429 (comme l'API réelle);
+    p429 / p5xx: probabilité d'une erreur injectée, tirée d'un générateur initialisé par `seed`;
+    scheduled_from: date ISO à partir de laquelle les matchs ne sont que programmés (0-0, pas "Final").
+    """
+
+    def __init__(self, players=500, games=2000, seed=42, latency=0.0, p429=0.0, p5xx=0.0,
+                 retry_after=1.0, rate_limit=None, host="127.0.0.1", port=0, scheduled_from=None):
+        self.data = {"players": list(fake_players(players, seed)),
+                     "games": list(fake_games(games, seed, scheduled_from=scheduled_from))}
+        self.latency = latency
+        self.p429 = p429
+        self.p5xx = p5xx
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window = []
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fault(self):
+        """None, "429" ou "5xx" pour la requête courante."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self.window = [t for t in self.window if now - t < 1.0]
+                if len(self.window) >= self.rate_limit:
+                    return "429"
+                self.window.append(now)
+            draw = self.rng.random()
+        if draw < self.p429:
+            return "429"
+        if draw < self.p429 + self.p5xx:
+            return "5xx"
+        return None
+
+    def _select(self, resource, query):
+        rows = self.data[resource]
+        if resource == "games":
+            seasons = {int(s) for s in query.get("seasons[]", [])}
+            if seasons:
+                rows = [g for g in rows if g["season"] in seasons]
+            if query.get("start_date"):
+                rows = [g for g in rows if g["date"] >= query["start_date"][0]]
+        return rows
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                resource = url.path.rstrip("/").rsplit("/", 1)[-1]
+                if resource not in mock.data:
+                    return self._send(404, {"error": "not found"})
+                if mock.latency:
+                    time.sleep(mock.latency)
+                fault = mock._fault()
+                if fault == "429":
+                    with mock.lock:
+                        mock.stats["429"] += 1
+                    return self._send(429, {"error": "Too Many Requests"},
+                                      {"Retry-After": f"{mock.retry_after:g}"})
+                if fault == "5xx":
+                    with mock.lock:
+                        mock.stats["5xx"] += 1
+                    return self._send(503, {"error": "Service Unavailable"})
+
+                query = parse_qs(url.query)
+                page = int(query.get("page", ["1"])[0])
+                per_page = min(100, int(query.get("per_page", ["25"])[0]))
+                rows = mock._select(resource, query)
+                start = (page - 1) * per_page
+                data = rows[start:start + per_page]
+                with mock.lock:
+                    mock.stats["ok"] += 1
+                self._send(200, {"data": data, "meta": {"current_page": page, "per_page": per_page,
+                                                        "total_count": len(rows)}})
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0, help="secondes ajoutées à chaque réponse")
+    parser.add_argument("--p429", type=float, default=0.0)
+    parser.add_argument("--p5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=float, help="requêtes/s avant 429")
+    parser.add_argument("--scheduled-from", help="date ISO: matchs à venir (0-0) à partir de ce jour")
+    args = parser.parse_args()
+
+    mock = MockBalldontlie(args.players, args.games, args.seed, args.latency, args.p429, args.p5xx,
+                           args.retry_after, args.rate_limit, args.host, args.port, args.scheduled_from)
+    print(f"🏀 Mock balldontlie on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(mock.stats))
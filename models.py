@@ -1,13 +1,24 @@
 # models.py
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Float
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Date, DateTime, Float, Index
 from sqlalchemy.orm import relationship, declarative_base, sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# réglages du pool de connexions (API et ETL)
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+}
+
 Base = declarative_base()
 
  
@@ -32,6 +43,13 @@ class Player(Base):
 
     team = relationship("Team", back_populates="players")
 
+    # /players?team_id=&q= : filtre équipe + recherche ilike '%q%' (trigram)
+    __table_args__ = (
+        Index("ix_players_team_id_id", "team_id", "id"),
+        Index("ix_players_first_trgm", "first", postgresql_using="gin", postgresql_ops={"first": "gin_trgm_ops"}),
+        Index("ix_players_last_trgm", "last", postgresql_using="gin", postgresql_ops={"last": "gin_trgm_ops"}),
+    )
+
  
 class Season(Base):
     __tablename__ = "seasons"
@@ -42,7 +60,7 @@ class Game(Base):
     __tablename__ = "games"
     id = Column(Integer, primary_key=True)
     season = Column(Integer, ForeignKey("seasons.year"))
-    date = Column(String)  # نحتفظ بالتاريخ كـ String (يمكن تغييره إلى Date)
+    date = Column(Date)
     home_team_id = Column(Integer, ForeignKey("teams.id"))
     visitor_team_id = Column(Integer, ForeignKey("teams.id"))
     home_score = Column(Integer, default=0)
@@ -51,11 +69,91 @@ class Game(Base):
     home_team = relationship("Team", foreign_keys=[home_team_id], back_populates="home_games")
     visitor_team = relationship("Team", foreign_keys=[visitor_team_id], back_populates="visitor_games")
 
+    # /games?season=&team_id= : saison + or_(home_team_id, visitor_team_id)
+    __table_args__ = (
+        Index("ix_games_season_id", "season", "id"),
+        Index("ix_games_home_team_id_season", "home_team_id", "season"),
+        Index("ix_games_visitor_team_id_season", "visitor_team_id", "season"),
+    )
 
- 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class TeamSeasonStat(Base):
+    """Bilan d'une équipe sur une saison, matérialisé par standings.refresh_team_season_stats."""
+    __tablename__ = "team_season_stats"
+    season = Column(Integer, ForeignKey("seasons.year"), primary_key=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), primary_key=True)
+    games = Column(Integer, nullable=False)
+    wins = Column(Integer, nullable=False)
+    losses = Column(Integer, nullable=False)
+    points_for = Column(BigInteger, nullable=False)
+    points_against = Column(BigInteger, nullable=False)
+    home_wins = Column(Integer, nullable=False)
+    home_losses = Column(Integer, nullable=False)
+    away_wins = Column(Integer, nullable=False)
+    away_losses = Column(Integer, nullable=False)
+
+    # /teams/{id}/summary (la clé primaire sert /standings?season=)
+    __table_args__ = (
+        Index("ix_team_season_stats_team_id_season", "team_id", "season"),
+    )
+
+
+class PlayerEventTotal(Base):
+    """Agrégat (joueur, événement) du flux big data (extract_big.aggregate_big)."""
+    __tablename__ = "player_event_totals"
+    player_id = Column(Integer, primary_key=True)
+    event = Column(String, primary_key=True)
+    events = Column(BigInteger, nullable=False)
+    total = Column(BigInteger, nullable=False)
+    first_at = Column(DateTime)
+    last_at = Column(DateTime)
+
+
+# moteurs créés au premier usage (get_engine / get_async_engine): importer models
+# ne charge pas le driver et n'exige pas DATABASE_URL (démarrage des workers de l'API)
+_engines = {}
+
+
+def get_engine():
+    if "sync" not in _engines:
+        if not DATABASE_URL:
+            raise ValueError("DATABASE_URL not found in .env file")
+        _engines["sync"] = create_engine(DATABASE_URL, **POOL_OPTIONS)
+    return _engines["sync"]
+
+
+def get_async_engine():
+    # variante async pour les endpoints de lecture (psycopg 3 en mode async)
+    if "async" not in _engines:
+        if not DATABASE_URL:
+            raise ValueError("DATABASE_URL not found in .env file")
+        url = make_url(DATABASE_URL).set(drivername="postgresql+psycopg")
+        _engines["async"] = create_async_engine(url, **POOL_OPTIONS)
+    return _engines["async"]
+
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+_async_session_factory = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def SessionLocal(**kw):
+    return _session_factory(bind=get_engine(), **kw)
+
+
+def AsyncSessionLocal(**kw):
+    return _async_session_factory(bind=get_async_engine(), **kw)
+
+
+def __getattr__(name):
+    # compatibilité: models.engine / models.async_engine
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def init_db():
-    Base.metadata.create_all(engine)
+    # le schéma est géré par migrations.py (et non plus par create_all)
+    from migrations import migrate
+    migrate(get_engine())
     print("✅ Database schema created successfully!")
@@ -0,0 +1,163 @@
+# pipeline.py
+"""Pipeline ETL complet, exécuté par les jobs de jobs.py (hors du processus de l'API).
+
+Les extractions sont indépendantes et tournent en parallèle; la transformation attend
+l'API, puis les chargements PostgreSQL et MongoDB partent en parallèle depuis la couche
+curated. La branche big data (extract_big -> aggregate_big -> chargement des totaux) est
+à part: son échec n'empêche pas le chargement des équipes, joueurs et matchs.
+Une étape dont les entrées n'ont pas changé depuis son dernier succès est sautée.
+"""
+import os
+from functools import partial
+
+from dag import DAG, Stage
+from raw_store import raw_path
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+# "process": une étape = un processus (timeouts effectifs, pas de GIL partagé); "thread" sinon
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "process")
+
+STAGES = ["extract_api", "extract_web", "extract_csv", "extract_sql", "extract_big",
+          "transform", "aggregate_big", "load_postgres", "load_mongo",
+          "load_events_postgres", "load_events_mongo"]
+
+
+# les imports sont faits dans chaque étape: un processus d'étape ne charge que ce qu'il utilise
+def extract_api(incremental=True):
+    from extract_api import run_api
+    players, games = run_api(incremental=incremental)
+    return {"rows": {"players": len(players), "games": len(games)}}
+
+
+def extract_web():
+    from extract_web import run_web
+    return run_web()
+
+
+def extract_csv():
+    from extract_csv import run_csv
+    run_csv()
+
+
+def extract_sql():
+    from extract_sql import run_sql
+    run_sql()
+
+
+def extract_big():
+    from extract_big import run_big
+    run_big()
+
+
+def aggregate_big():
+    from extract_big import aggregate_big
+    return aggregate_big()
+
+
+def transform():
+    # خطوة التحويل (تطبيع/تنظيف وكتابة ملفات جاهزة)
+    from transform import run_transform
+    return {"rows": run_transform()}
+
+
+def _events_path():
+    from transform import CURATED_DIR
+    return os.path.join(CURATED_DIR, "player_events.parquet")
+
+
+def _load_curated(sink):
+    from transform import iter_curated
+    rows = {}
+    # ordre des clés étrangères: équipes, joueurs, matchs
+    for kind in ("teams", "players", "games"):
+        rows[kind] = 0
+        for batch in iter_curated(kind):
+            sink(kind, batch)
+            rows[kind] += batch.num_rows
+    return {"rows": rows}
+
+
+def _load_events(sink):
+    # agrégats du flux big data (aggregate_big), s'ils existent
+    import pyarrow.parquet as pq
+    rows = {"player_events": 0}
+    if os.path.exists(_events_path()):
+        for batch in pq.ParquetFile(_events_path()).iter_batches():
+            sink("player_events", batch)
+            rows["player_events"] += batch.num_rows
+    return {"rows": rows}
+
+
+def _load_raw_api(sink):
+    # documents bruts de l'API, tels quels (collections raw_* de MongoDB)
+    from raw_store import iter_chunks, iter_jsonl
+    rows = {}
+    for kind, name in (("raw_players", "api_players"), ("raw_games", "api_games")):
+        rows[kind] = 0
+        for chunk in iter_chunks(iter_jsonl(raw_path(name))):
+            sink(kind, chunk)
+            rows[kind] += len(chunk)
+    return rows
+
+
+def load_postgres():
+    from load_pg import postgres_sink
+    with postgres_sink() as sink:
+        return _load_curated(sink)
+
+
+def load_mongo():
+    from load_mongo import mongo_sink
+    with mongo_sink() as sink:
+        result = _load_curated(sink)
+        result["rows"].update(_load_raw_api(sink))
+        return result
+
+
+def load_events_postgres():
+    from load_pg import postgres_sink
+    with postgres_sink() as sink:
+        return _load_events(sink)
+
+
+def load_events_mongo():
+    from load_mongo import mongo_sink
+    with mongo_sink() as sink:
+        return _load_events(sink)
+
+
+def build_dag(incremental=True, executor=None, max_workers=None):
+    from transform import CURATED_DIR
+
+    raw_api = [raw_path("api_players"), raw_path("api_games")]
+    # sorties de transform (player_events.parquet, dans le même dossier, a ses propres étapes)
+    curated = [os.path.join(CURATED_DIR, name) for name in ("teams.parquet", "players.parquet", "games")]
+    stages = [
+        Stage("extract_api", partial(extract_api, incremental=incremental), retries=2, timeout=3600),
+        Stage("extract_web", extract_web, retries=2, timeout=300),
+        Stage("extract_csv", extract_csv, retries=1, timeout=300),
+        Stage("extract_sql", extract_sql, retries=1, timeout=300),
+        Stage("extract_big", extract_big, retries=1, timeout=600),
+        Stage("transform", transform, deps=["extract_api"], inputs=raw_api, timeout=3600),
+        Stage("aggregate_big", aggregate_big, deps=["extract_big"], inputs=[raw_path("bigdata")], timeout=3600),
+        Stage("load_postgres", load_postgres, deps=["transform"], inputs=curated, retries=1, timeout=3600),
+        Stage("load_mongo", load_mongo, deps=["transform"], inputs=curated + raw_api, retries=1, timeout=3600),
+        Stage("load_events_postgres", load_events_postgres, deps=["aggregate_big"], inputs=[_events_path()],
+              retries=1, timeout=3600),
+        Stage("load_events_mongo", load_events_mongo, deps=["aggregate_big"], inputs=[_events_path()],
+              retries=1, timeout=3600),
+    ]
+    return DAG(stages, max_workers=max_workers or PIPELINE_MAX_WORKERS, executor=executor or PIPELINE_EXECUTOR)
+
+
+def full_pipeline(incremental=True, report=None):
+    """`report` (jobs.JobReporter) reçoit le statut et la durée de chaque étape.
+
+    Un rafraîchissement complet (incremental=False) ré-exécute aussi les étapes inchangées.
+    """
+    results = build_dag(incremental).run(force=not incremental, report=report)
+    failed = sorted(name for name, r in results.items() if r["status"] not in ("succeeded", "skipped"))
+    if failed:
+        raise RuntimeError(f"ETL stages failed: {', '.join(failed)}")
+    print("Full ETL pipeline finished")
+    return results
@@ -0,0 +1,49 @@
+import os
+import gzip
+import json
+from itertools import islice
+
+RAW_DIR = "data/raw"
+# RAW_COMPRESSION=gzip pour écrire des .jsonl.gz
+RAW_COMPRESSION = os.getenv("RAW_COMPRESSION", "").lower()
+
+
+def raw_path(name, raw_dir=RAW_DIR):
+    """Chemin du fichier JSONL brut pour `name` (existant de préférence)."""
+    plain = os.path.join(raw_dir, f"{name}.jsonl")
+    packed = plain + ".gz"
+    if os.path.exists(packed) and not os.path.exists(plain):
+        return packed
+    if os.path.exists(plain):
+        return plain
+    return packed if RAW_COMPRESSION == "gzip" else plain
+
+
+def open_raw(path, mode="r"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def append_jsonl(path, rows):
+    with open_raw(path, "a") as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+
+def iter_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open_raw(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_chunks(rows, size=10_000):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
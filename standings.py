@@ -0,0 +1,43 @@
+# standings.py
+"""Agrégats équipe/saison matérialisés (team_season_stats), servis par /standings et /teams/{id}/summary.
+
+Recalculés après chaque chargement PostgreSQL, dans la même transaction, pour les seules
+saisons dont des matchs ont changé. Un match compte quand il a un vainqueur (score différent).
+"""
+from sqlalchemy import text
+
+# une ligne par (équipe, match) vue de chaque côté, puis agrégée par saison
+REFRESH_SQL = """
+INSERT INTO team_season_stats (season, team_id, games, wins, losses, points_for, points_against,
+                               home_wins, home_losses, away_wins, away_losses)
+SELECT season, team_id, count(*), count(*) FILTER (WHERE win), count(*) FILTER (WHERE NOT win),
+       sum(points_for), sum(points_against),
+       count(*) FILTER (WHERE home AND win), count(*) FILTER (WHERE home AND NOT win),
+       count(*) FILTER (WHERE NOT home AND win), count(*) FILTER (WHERE NOT home AND NOT win)
+FROM (
+    SELECT season, home_team_id AS team_id, true AS home, home_score AS points_for,
+           visitor_score AS points_against, home_score > visitor_score AS win
+    FROM games WHERE home_score <> visitor_score {where}
+    UNION ALL
+    SELECT season, visitor_team_id, false, visitor_score, home_score, visitor_score > home_score
+    FROM games WHERE home_score <> visitor_score {where}
+) sides
+WHERE season IS NOT NULL AND team_id IS NOT NULL
+GROUP BY season, team_id
+"""
+
+
+def refresh_team_season_stats(conn, seasons=None):
+    """Recalcule team_season_stats pour `seasons` (toutes si None); retourne le nombre de lignes écrites.
+
+    `conn`: connexion ou session SQLAlchemy, dans la transaction du chargement.
+    """
+    if seasons is None:
+        conn.execute(text("DELETE FROM team_season_stats"))
+        return conn.execute(text(REFRESH_SQL.format(where=""))).rowcount
+    seasons = sorted({s for s in seasons if s is not None})
+    if not seasons:
+        return 0
+    params = {"seasons": seasons}
+    conn.execute(text("DELETE FROM team_season_stats WHERE season = ANY(:seasons)"), params)
+    return conn.execute(text(REFRESH_SQL.format(where="AND season = ANY(:seasons)")), params).rowcount
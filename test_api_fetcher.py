@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from api_fetcher import PageFetcher
+
+TOTAL_ROWS = 250
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    throttled = set()
+    failing = set()
+    served = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query["page"][0])
+        per_page = int(query["per_page"][0])
+
+        if page in self.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if page not in self.throttled:
+            self.throttled.add(page)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        self.served.append(page)
+        start = (page - 1) * per_page
+        rows = [{"id": i} for i in range(start, min(start + per_page, TOTAL_ROWS))]
+        body = json.dumps({"data": rows}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_fetch_all_pages_with_429():
+    StubHandler.throttled = set()
+    StubHandler.failing = set()
+    server, url = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            with PageFetcher(url, max_workers=4, rate=100, backoff=0, checkpoint_dir=tmp) as fetcher:
+                rows = fetcher.fetch("players", per_page=20, max_items=1000)
+    finally:
+        server.shutdown()
+    assert [r["id"] for r in rows] == list(range(TOTAL_ROWS))
+
+
+def test_resume_from_checkpoint():
+    StubHandler.throttled = set(range(1, 20))
+    StubHandler.failing = {4}
+    server, url = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            fetcher = PageFetcher(url, max_workers=2, rate=100, max_retries=1, backoff=0, checkpoint_dir=tmp)
+            failed = False
+            try:
+                fetcher.fetch("players", per_page=20, max_items=200)
+            except Exception:
+                failed = True
+            assert failed, "page 4 should have failed"
+
+            StubHandler.failing = set()
+            StubHandler.served = []
+            rows = fetcher.fetch("players", per_page=20, max_items=200)
+            fetcher.close()
+    finally:
+        server.shutdown()
+    assert [r["id"] for r in rows] == list(range(200))
+    assert 1 not in StubHandler.served
+
+
+class AlwaysThrottled(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        AlwaysThrottled.hits += 1
+        self.send_response(429)  # sans Retry-After: délai de repli exponentiel
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_persistent_429_gives_up_with_growing_backoff():
+    AlwaysThrottled.hits = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AlwaysThrottled)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            with PageFetcher(f"http://127.0.0.1:{server.server_port}", max_workers=1, rate=1000,
+                             max_retries=3, backoff=0.01, checkpoint_dir=tmp) as fetcher:
+                pauses = []
+                fetcher.bucket.pause = pauses.append
+                try:
+                    fetcher.get_page("players", {"per_page": 20}, 1)
+                except requests.HTTPError as e:
+                    assert e.response.status_code == 429
+                else:
+                    raise AssertionError("429 en boucle: get_page aurait dû abandonner")
+    finally:
+        server.shutdown()
+    assert pauses == [0.01, 0.02, 0.04]
+    assert AlwaysThrottled.hits == 4
+
+
+if __name__ == "__main__":
+    test_fetch_all_pages_with_429()
+    test_resume_from_checkpoint()
+    test_persistent_429_gives_up_with_growing_backoff()
+    print("✅ api_fetcher OK")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+from sqlalchemy import event, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# lignes réservées au test (base de développement partagée)
+TEAMS = [980001, 980002]
+PLAYERS = [980001, 980002, 980003]
+GAMES = [980001, 980002]
+SEASON = 1903
+
+
+def _cleanup(sess):
+    sess.execute(text("DELETE FROM games WHERE id = ANY(:g)"), {"g": GAMES})
+    sess.execute(text("DELETE FROM players WHERE id = ANY(:p)"), {"p": PLAYERS})
+    sess.execute(text("DELETE FROM team_season_stats WHERE season = :s"), {"s": SEASON})
+    sess.execute(text("DELETE FROM seasons WHERE year = :s"), {"s": SEASON})
+    sess.execute(text("DELETE FROM teams WHERE id = ANY(:t)"), {"t": TEAMS})
+    sess.commit()
+
+
+def test_expand_and_batch_in_one_query():
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL non définie dans .env")
+        return
+
+    from fastapi.testclient import TestClient
+    import main
+    from models import SessionLocal, get_async_engine, init_db
+
+    init_db()
+    with SessionLocal() as sess:
+        _cleanup(sess)
+        sess.execute(text("INSERT INTO teams (id, abbr, name) VALUES (980001, 'AAA', 'Team A'), (980002, 'BBB', 'Team B')"))
+        sess.execute(text("INSERT INTO seasons (year) VALUES (:s)"), {"s": SEASON})
+        sess.execute(text("""INSERT INTO players (id, first, last, pos, team_id) VALUES
+            (980001, 'Ann', 'A', 'G', 980001), (980002, 'Bob', 'B', 'F', 980002), (980003, 'Cy', 'C', 'C', NULL)"""))
+        sess.execute(text("""INSERT INTO games (id, season, home_team_id, visitor_team_id, home_score, visitor_score)
+            VALUES (980001, :s, 980001, 980002, 100, 99), (980002, :s, 980002, 980001, 90, 101)"""), {"s": SEASON})
+        sess.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = get_async_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    headers = {"X-API-Key": main.PUBLIC_API_KEY} if main.PUBLIC_API_KEY else {}
+    try:
+        with TestClient(main.app) as client:
+            statements.clear()
+            body = client.post("/players/batch", json={"ids": [980003, 980001, 980001, 979999], "expand": "teams"},
+                               headers=headers).json()
+            assert [p["id"] for p in body["items"]] == [980003, 980001]
+            assert body["items"][0]["team"] is None and body["items"][1]["team"]["abbr"] == "AAA"
+            assert body["missing"] == [979999]
+            assert len(statements) == 1
+
+            statements.clear()
+            games = client.post("/games/batch", json={"ids": GAMES, "expand": "teams"}, headers=headers).json()["items"]
+            assert [(g["home_team"]["abbr"], g["visitor_team"]["abbr"]) for g in games] == [("AAA", "BBB"), ("BBB", "AAA")]
+            assert len(statements) == 1
+
+            statements.clear()
+            page = client.get(f"/games?season={SEASON}&expand=teams&count=none", headers=headers).json()
+            assert page["items"][1]["home_team"] == {"id": 980002, "abbr": "BBB", "name": "Team B"}
+            assert len(statements) == 1
+
+            plain = client.get(f"/games?season={SEASON}&count=none", headers=headers).json()
+            assert "home_team" not in plain["items"][0]
+
+            too_many = client.post("/games/batch", json={"ids": list(range(main.BATCH_MAX_IDS + 1))}, headers=headers)
+            assert too_many.status_code == 422
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        with SessionLocal() as sess:
+            _cleanup(sess)
@@ -0,0 +1,66 @@
+# test_cache.py
+import multiprocessing
+
+from cache import ResponseCache, SQLiteCache
+
+
+def _worker_set(path, key, body):
+    SQLiteCache(path).set(key, body)
+
+
+def test_memory_lru_and_counters():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a").body == b"1"
+    cache.set("c", b"3")  # "b" est le moins récemment lu
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 2)
+
+
+def test_sqlite_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    reader = SQLiteCache(path, ttl=60)
+    proc = multiprocessing.get_context("spawn").Process(target=_worker_set, args=(path, "/players?", b"[1]"))
+    proc.start()
+    proc.join(10)
+    entry = reader.get("/players?")
+    assert entry is not None and entry.body == b"[1]"
+
+    # fin d'ETL dans un autre worker: la version partagée change pour tous
+    version = reader.version
+    SQLiteCache(path).invalidate()
+    assert reader.version == version + 1
+    assert reader.get("/players?") is None
+    # une réponse calculée avant l'invalidation n'est pas stockée
+    reader.set("/players?", b"[0]", version)
+    assert reader.get("/players?") is None
+    assert (reader.stats()["hits"], reader.stats()["misses"]) == (1, 2)
+
+
+def test_sqlite_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2)
+    for key in "abc":
+        cache.set(key, key.encode())
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a") is None
+
+
+def test_sqlite_reads_batch_lru_writes(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2, touch_interval=3600)
+    cache.set("a", b"1")
+    cache.set("b", b"22")
+    cache.set("b", b"333")  # remplacement: les totaux tenus par triggers restent exacts
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (2, 4)
+
+    # les lectures n'écrivent rien tant que le lot n'est pas dû...
+    writes = []
+    cache._conn().set_trace_callback(lambda sql: writes.append(sql) if sql.lstrip().startswith("UPDATE") else None)
+    for _ in range(5):
+        assert cache.get("a").body == b"1"
+    assert writes == []
+    # ...mais l'éviction les prend en compte: "a" vient d'être lu, "b" part
+    cache.set("c", b"4")
+    assert cache.get("b") is None and cache.get("a") is not None
+    assert cache.stats()["entries"] == 2
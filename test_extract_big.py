@@ -0,0 +1,34 @@
+# test_extract_big.py
+import json
+from collections import defaultdict
+
+import pyarrow.parquet as pq
+
+import extract_big
+
+
+def test_chunked_aggregation_matches_line_by_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    path = extract_big.run_big(events=20_000, players=50, batch_size=3_000)
+
+    expected = defaultdict(lambda: [0, 0, None, None])
+    with open(path) as f:
+        for line in f:
+            e = json.loads(line)
+            agg = expected[(e["player_id"], e["event"])]
+            agg[0] += 1
+            agg[1] += e["value"]
+            agg[2] = min(agg[2] or e["timestamp"], e["timestamp"])
+            agg[3] = max(agg[3] or e["timestamp"], e["timestamp"])
+
+    # petits blocs et fusions fréquentes: plusieurs niveaux d'agrégats partiels
+    table, count = extract_big.aggregate_events(path, block_size=64 << 10, combine_every=3)
+    assert count == 20_000
+    got = {(r["player_id"], r["event"]): [r["events"], r["total"], r["first_at"].isoformat(), r["last_at"].isoformat()]
+           for r in table.to_pylist()}
+    assert got == {k: v for k, v in expected.items()}
+
+    result = extract_big.aggregate_big()
+    assert result["rows"] == {"events": 20_000, "aggregates": len(expected)}
+    assert pq.read_table("data/curated/player_events.parquet").num_rows == len(expected)
@@ -0,0 +1,161 @@
+# test_extract_web.py
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import pandas as pd
+
+import extract_web
+from extract_web import HostLimiter, PageSpec
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+STANDINGS = "//table[starts-with(@id, 'standings-')]"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class FixtureServer:
+    """Sert `pages` ({chemin: html}) avec un ETag (304 si If-None-Match correspond).
+
+    Note les codes servis et le maximum de requêtes simultanées.
+    """
+
+    def __init__(self, pages, latency=0.0):
+        self.pages = pages
+        self.latency = latency
+        self.codes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.latency)
+                    self._serve()
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def _serve(self):
+                page = server.pages[self.path]
+                etag = '"%s"' % hashlib.sha1(page).hexdigest()
+                code = 304 if self.headers.get("If-None-Match") == etag else 200
+                with server.lock:
+                    server.codes.append(code)
+                self.send_response(code)
+                self.send_header("ETag", etag)
+                if code == 200:
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                if code == 200:
+                    self.wfile.write(page)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = "http://127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_single_pass_tables_match_read_html():
+    page = fixture("mvp_wiki.html")
+    tables = extract_web.extract_tables(page)
+    expected = [df.dropna(how="all") for df in pd.read_html(StringIO(page.decode()), attrs=None)[1:]]
+    assert [t.to_csv(index=False) for t in tables] == [e.to_csv(index=False) for e in expected]
+    # rowspan déplié sur la ligne suivante
+    assert tables[0].iloc[1].tolist() == ["2018–19", "Giannis Antetokounmpo", "Power forward", "Greece", "Milwaukee Bucks"]
+
+
+def test_conditional_requests_and_unchanged_skip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    page = fixture("mvp_wiki.html")
+
+    with FixtureServer({"/wiki/mvp": page}) as server:
+        pages = [PageSpec("mvp_wiki", server.base_url + "/wiki/mvp")]
+        assert extract_web.run_web(pages, parse_workers=1)["pages"] == {"mvp_wiki": {"status": "written", "tables": 2}}
+        csv = tmp_path / "data" / "raw" / "mvp_wiki_table_1.csv"
+        mtime = csv.stat().st_mtime_ns
+
+        # page inchangée: 304, corps repris du cache disque, CSV non réécrits
+        assert extract_web.run_web(pages, parse_workers=1)["pages"]["mvp_wiki"]["status"] == "unchanged"
+        assert csv.stat().st_mtime_ns == mtime
+
+        server.pages["/wiki/mvp"] = page.replace(b"Joel Embiid", b"Nikola Jokic")
+        assert extract_web.run_web(pages, parse_workers=1)["pages"]["mvp_wiki"]["status"] == "written"
+    assert server.codes == [200, 304, 200]
+    assert "Nikola Jokic" in csv.read_text()
+
+
+def test_host_limiter_spaces_and_bounds_requests():
+    limiter = HostLimiter(per_host=2, delay=0.05)
+    starts, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def request(url):
+        with limiter.slot(url):
+            with lock:
+                starts.append((url, time.monotonic()))
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    urls = ["http://a.test/%d" % i for i in range(6)] + ["http://b.test/0"]
+    threads = [threading.Thread(target=request, args=(u,)) for u in urls]
+    began = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 6 départs sur a.test: le dernier attend au moins 5 délais
+    a = sorted(t for url, t in starts if "a.test" in url)
+    assert a[-1] - began >= 5 * 0.05
+    # l'autre hôte n'attend pas la file de a.test
+    b = next(t for url, t in starts if "b.test" in url)
+    assert b < a[-1]
+    assert peak[0] <= 3
+
+
+def test_many_pages_with_politeness_and_parse_pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    paths = {f"/wiki/page_{i}": fixture("mvp_wiki.html") for i in range(4)}
+    paths["/wiki/standings"] = fixture("standings_2023.html")
+
+    with FixtureServer(paths, latency=0.1) as server:
+        pages = [PageSpec(f"award_{i}", server.base_url + f"/wiki/page_{i}") for i in range(4)]
+        pages.append(PageSpec("standings_2023", server.base_url + "/wiki/standings", selector=STANDINGS))
+        result = extract_web.run_web(pages, max_workers=8, parse_workers=2,
+                                     limiter=HostLimiter(per_host=2, delay=0.05))
+
+    assert result["tables"] == 4 * 2 + 2
+    assert all(r["status"] == "written" for r in result["pages"].values())
+    # un seul hôte: jamais plus de 2 requêtes en vol
+    assert server.max_in_flight == 2
+
+    west = pd.read_csv(tmp_path / "data" / "raw" / "standings_2023_table_2.csv")
+    assert west.columns[0] == "Western Conference" and len(west) == 3
+    assert not (tmp_path / "data" / "raw" / "standings_2023_table_3.csv").exists()
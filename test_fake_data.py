@@ -0,0 +1,34 @@
+# test_fake_data.py
+import pyarrow.compute as pc
+
+from fake_data import fake_games, fake_players, fake_stats
+from transform import transform_records
+
+
+def test_generator_is_deterministic():
+    assert list(fake_games(50, seed=7)) == list(fake_games(50, seed=7))
+    assert list(fake_players(50, seed=7)) != list(fake_players(50, seed=8))
+
+
+def test_generated_payloads_go_through_the_transform():
+    players = list(fake_players(300, free_agents=0.1))
+    games = list(fake_games(1000))
+    out = {}
+    for kind, table in transform_records(players, games, chunk_size=128):
+        out.setdefault(kind, []).append(table)
+    rows = {kind: sum(t.num_rows for t in tables) for kind, tables in out.items()}
+    assert rows == {"teams": 30, "players": 300, "games": 1000}
+
+    team_ids = set().union(*(set(t.column("id").to_pylist()) for t in out["teams"]))
+    for table in out["games"]:
+        assert set(table.column("home_team_id").to_pylist()) <= team_ids
+        assert pc.all(pc.not_equal(table.column("home_team_id"), table.column("visitor_team_id"))).as_py()
+    free_agents = sum(t.column("team_id").null_count for t in out["players"])
+    assert free_agents == sum(p["team"] is None for p in players)
+
+
+def test_stats_box_scores_are_consistent():
+    for stat in fake_stats(200, players=10, games=20):
+        assert stat["reb"] == stat["oreb"] + stat["dreb"]
+        assert stat["pts"] == 2 * (stat["fgm"] - stat["fg3m"]) + 3 * stat["fg3m"] + stat["ftm"]
+        assert 1 <= stat["player"]["id"] <= 10 and stat["team"]["id"] == stat["player"]["team_id"]
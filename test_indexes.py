@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import os
+from sqlalchemy import or_, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def explain(sess, query):
+    sql = query.statement.compile(dialect=sess.bind.dialect, compile_kwargs={"literal_binds": True})
+    return "\n".join(sess.execute(text(f"EXPLAIN {sql}")).scalars())
+
+
+def test_read_queries_use_indexes():
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL non définie dans .env")
+        return
+
+    from models import SessionLocal, init_db, Player, Game, TeamSeasonStat
+    init_db()
+
+    with SessionLocal() as sess:
+        # sans seq scan possible, le planner doit trouver un index adapté à chaque filtre
+        sess.execute(text("SET LOCAL enable_seqscan = off"))
+        cases = [
+            (sess.query(Game).filter(Game.season == 2023), ["ix_games_season_id"]),
+            (sess.query(Game).filter(or_(Game.home_team_id == 1, Game.visitor_team_id == 1)),
+             ["ix_games_home_team_id_season", "ix_games_visitor_team_id_season"]),
+            (sess.query(Game).filter(Game.season == 2023, or_(Game.home_team_id == 1, Game.visitor_team_id == 1)),
+             ["ix_games_home_team_id_season", "ix_games_visitor_team_id_season"]),
+            (sess.query(Player).filter(Player.team_id == 1), ["ix_players_team_id_id"]),
+            (sess.query(TeamSeasonStat).filter(TeamSeasonStat.season == 2023), ["team_season_stats_pkey"]),
+            (sess.query(TeamSeasonStat).filter(TeamSeasonStat.team_id == 1), ["ix_team_season_stats_team_id_season"]),
+        ]
+        trgm = sess.execute(text("SELECT 1 FROM schema_migrations WHERE version = '0003_players_name_trgm'")).scalar()
+        if trgm:
+            cases.append((sess.query(Player).filter(or_(Player.first.ilike("%leb%"), Player.last.ilike("%leb%"))),
+                          ["ix_players_first_trgm", "ix_players_last_trgm"]))
+        else:
+            print("⚠️ pg_trgm absent: name search indexes not checked")
+
+        for query, indexes in cases:
+            plan = explain(sess, query)
+            assert "Seq Scan" not in plan, plan
+            for index in indexes:
+                assert index in plan, plan
+        sess.rollback()
+
+
+if __name__ == "__main__":
+    test_read_queries_use_indexes()
+    print("✅ Read API queries use their indexes")
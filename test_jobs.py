@@ -0,0 +1,141 @@
+# test_jobs.py
+import os
+import time
+import multiprocessing
+from functools import partial
+
+import jobs
+from jobs import JobManager
+
+STAGES = ["first", "second"]
+
+
+def fake_pipeline(report, delay=0.0, fail=False):
+    with report.stage("first") as info:
+        info["rows"] = 3
+    with report.stage("second"):
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("boom")
+
+
+def _slow_load(path, delay):
+    with open(path + ".started", "w") as f:
+        f.write("started")
+    time.sleep(delay)
+    with open(path, "w") as f:
+        f.write("committed")
+
+
+def dag_pipeline(report, path):
+    # une étape dans son propre processus (PIPELINE_EXECUTOR=process), petit-enfant de l'API
+    from dag import DAG, Stage
+    DAG([Stage("load", partial(_slow_load, path, 2.0))], executor="process",
+        state_path=path + ".state").run(report=report)
+
+
+def _wait(manager, job_id, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_single_flight_and_status(tmp_path):
+    finished = []
+    manager = JobManager(str(tmp_path), "test_jobs:fake_pipeline", on_finish=finished.append)
+    job, created = manager.submit(delay=1.0)
+    again, created_again = manager.submit(delay=1.0)
+    assert created and not created_again
+    assert again["id"] == job["id"]
+
+    job = _wait(manager, job["id"])
+    assert job["status"] == "succeeded"
+    assert job["progress"] == {"done": 2, "total": 2}
+    assert [s["name"] for s in job["stages"]] == STAGES
+    assert job["stages"][0]["rows"] == 3
+    assert job["stages"][1]["duration"] >= 1.0
+    summary = manager.last_summary()
+    assert summary["id"] == job["id"] and summary["status"] == "succeeded"
+    assert [s["name"] for s in summary["stages"]] == STAGES
+    assert "etl_rows_total" in summary["metrics"]
+
+    # le job précédent est terminé: un nouveau peut démarrer
+    failed, created = manager.submit(fail=True)
+    assert created
+    failed = _wait(manager, failed["id"])
+    assert failed["status"] == "failed" and "boom" in failed["error"]
+    assert failed["stages"][1]["status"] == "failed"
+    deadline = time.time() + 5
+    while len(finished) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(finished) == 2
+
+
+def test_cancel(tmp_path):
+    manager = JobManager(str(tmp_path), "test_jobs:fake_pipeline")
+    job, _ = manager.submit(delay=30)
+    deadline = time.time() + 20
+    while manager.get(job["id"])["current_stages"] != ["second"] and time.time() < deadline:
+        time.sleep(0.05)
+    job = manager.cancel(job["id"])
+    assert job["status"] == "cancelled"
+    assert manager.active() is None
+    assert manager.get("../etc") is None
+
+
+def test_cancel_stops_running_stage_process(tmp_path):
+    manager = JobManager(str(tmp_path), "test_jobs:dag_pipeline")
+    path = str(tmp_path / "load.out")
+    job, _ = manager.submit(path=path)
+    deadline = time.time() + 20
+    while not os.path.exists(path + ".started") and time.time() < deadline:
+        time.sleep(0.05)
+
+    assert manager.cancel(job["id"])["status"] == "cancelled"
+    time.sleep(3)  # l'étape aurait terminé son écriture entre-temps
+    assert not os.path.exists(path)
+
+
+def _racing_submit(jobs_dir, start, results):
+    # élargit la fenêtre entre la lecture de current.json et son écriture
+    active = JobManager.active
+    JobManager.active = lambda self: (active(self), time.sleep(0.3))[0]
+    manager = JobManager(jobs_dir, "test_jobs:fake_pipeline")
+    start.wait()
+    job, created = manager.submit(delay=1.0)
+    results.put((job["id"], created))
+
+
+def test_single_flight_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_POLL_INTERVAL", 0)
+    finished = []
+    other = JobManager(str(tmp_path), "test_jobs:fake_pipeline", on_finish=finished.append)
+    other.poll()  # point de départ: aucun job terminé
+
+    # quatre workers uvicorn (processus distincts) demandent un job au même instant
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Event(), context.Queue()
+    workers = [context.Process(target=_racing_submit, args=(str(tmp_path), start, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    time.sleep(1.0)
+    start.set()
+    submitted = [results.get(timeout=30) for _ in workers]
+    for w in workers:
+        w.join(30)
+    assert sum(created for _, created in submitted) == 1
+    assert len({job_id for job_id, _ in submitted}) == 1
+
+    # un worker qui n'a pas lancé le job voit sa fin via poll() et déclenche son on_finish
+    assert _wait(other, submitted[0][0])["status"] == "succeeded"
+    deadline = time.time() + 5
+    while not finished and time.time() < deadline:
+        other.poll()
+        time.sleep(0.05)
+    assert [j["id"] for j in finished] == [submitted[0][0]]
+    other.poll()
+    assert len(finished) == 1
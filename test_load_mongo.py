@@ -0,0 +1,97 @@
+# test_load_mongo.py
+import mongomock
+import pytest
+
+import load_mongo
+from fake_data import fake_players
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    db = mongomock.MongoClient()["nba"]
+    monkeypatch.setattr(load_mongo, "mdb", db)
+    monkeypatch.setattr(load_mongo, "_unique_indexes", set())
+    return db
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Nombre d'opérations envoyées par bulk_write, par collection."""
+    sent = {}
+    bulk_write = load_mongo._bulk_write
+
+    def spy(coll, ops, label):
+        sent[coll.name] = sent.get(coll.name, 0) + len(ops)
+        return bulk_write(coll, ops, label)
+
+    monkeypatch.setattr(load_mongo, "_bulk_write", spy)
+    return sent
+
+
+def test_second_pass_sends_nothing_and_changes_replace(mdb, writes):
+    players = list(fake_players(120, seed=4))
+    players[0]["legacy"] = "ancien champ"
+    with load_mongo.mongo_sink() as sink:
+        sink("raw_players", players)
+    assert writes == {"raw_players": 120}
+
+    writes.clear()
+    with load_mongo.mongo_sink() as sink:
+        sink("raw_players", [dict(p) for p in players])
+    assert writes == {}
+
+    changed = {k: v for k, v in players[0].items() if k != "legacy"}
+    changed["position"] = "C"
+    with load_mongo.mongo_sink() as sink:
+        sink("raw_players", [changed] + players[1:])
+    assert writes == {"raw_players": 1}
+
+    stored = mdb.raw_players.find_one({"id": changed["id"]}, {"_id": 0})
+    # remplacé en entier: l'ancien champ a disparu, l'empreinte suit le nouveau contenu
+    assert "legacy" not in stored and stored["position"] == "C"
+    assert stored[load_mongo.HASH_FIELD] == load_mongo.content_hash(changed)
+    assert mdb.raw_players.count_documents({}) == 120
+
+
+def test_deduplicate_keeps_first_and_deletes_in_chunks(mdb):
+    coll = mdb.raw_stats
+    coll.insert_many([{"id": i % 4, "n": i} for i in range(12)] + [{"id": None, "n": 100}, {"n": 101}])
+    calls = []
+    delete_many = coll.delete_many
+
+    def spy(query):
+        calls.append(len(query["_id"]["$in"]))
+        return delete_many(query)
+
+    coll.delete_many = spy
+    removed = load_mongo.deduplicate_collection(coll, "id", chunk_size=3)
+
+    assert removed == 8 and calls == [3, 3, 2]
+    # le premier document de chaque id est gardé; les documents sans id ne sont pas touchés
+    assert sorted((d["id"], d["n"]) for d in coll.find({"id": {"$ne": None}})) == [(0, 0), (1, 1), (2, 2), (3, 3)]
+    assert coll.count_documents({"id": None}) == 2
+
+
+def test_ensure_unique_index_is_checked_once(mdb, monkeypatch):
+    coll = mdb.players
+    coll.insert_many([{"id": 1}, {"id": 1}, {"id": 2}])
+    load_mongo.ensure_unique_index(coll, "id")
+    assert load_mongo.has_unique_index(coll, "id") and coll.count_documents({}) == 2
+
+    def scan(*args, **kwargs):
+        raise AssertionError("index déjà vérifié: aucun scan attendu")
+
+    monkeypatch.setattr(load_mongo, "has_unique_index", scan)
+    monkeypatch.setattr(load_mongo, "deduplicate_collection", scan)
+    load_mongo.ensure_unique_index(coll, "id")
+
+
+def test_ensure_unique_index_skips_dedup_when_index_exists(mdb, monkeypatch):
+    mdb.games.create_index("id", unique=True)
+
+    def scan(*args, **kwargs):
+        raise AssertionError("index unique existant: pas de dédoublonnage")
+
+    monkeypatch.setattr(load_mongo, "deduplicate_collection", scan)
+    load_mongo.ensure_unique_index(mdb.games, "id")
+    assert (mdb.name, "games", "id") in load_mongo._unique_indexes
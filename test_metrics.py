@@ -0,0 +1,35 @@
+# test_metrics.py
+from functools import partial
+
+from dag import DAG, Stage
+from metrics import Registry, REGISTRY, ROWS, STAGE_RUNS
+
+
+def produce(rows):
+    ROWS.inc(rows, step="test", kind="games", direction="out")
+
+
+def test_render_and_merge():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    latency = registry.histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1))
+    requests.inc(route='/a"b')
+    latency.observe(0.5, route="/a")
+    latency.observe(3, route="/a")
+
+    other = Registry()
+    other.counter("requests_total", "Requests", ["route"]).inc(2, route='/a"b')
+    text = registry.render(other.snapshot())
+    assert 'requests_total{route="/a\\"b"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{route="/a"} 2' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_stage_process_metrics_are_merged(tmp_path):
+    REGISTRY.reset()
+    DAG([Stage("produce", partial(produce, 42))], executor="process", state_path=str(tmp_path / "s.json")).run()
+    assert ROWS.value(step="test", kind="games", direction="out") == 42
+    assert STAGE_RUNS.value(stage="produce", status="succeeded") == 1
@@ -0,0 +1,137 @@
+# test_mock_api.py
+import json
+
+import extract_api
+from api_fetcher import PageFetcher
+from mock_api import MockBalldontlie
+
+
+def test_fetcher_survives_injected_faults(tmp_path):
+    with MockBalldontlie(players=450, games=0, p429=0.2, p5xx=0.1, retry_after=0, seed=3) as mock:
+        with PageFetcher(mock.base_url, max_workers=4, rate=1000, backoff=0, max_retries=10,
+                         checkpoint_dir=str(tmp_path)) as fetcher:
+            rows = fetcher.fetch("players", per_page=50, max_items=1000)
+        stats = dict(mock.stats)
+    assert [r["id"] for r in rows] == list(range(1, 451))
+    assert stats["429"] and stats["5xx"]
+    # 9 pages pleines + la page vide finale (plus les pages déjà parties dans la dernière fenêtre)
+    assert stats["ok"] >= 10
+
+
+def test_run_api_against_mock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    with MockBalldontlie(players=150, games=600, seed=5) as mock:
+        monkeypatch.setattr(extract_api, "BASE_URL", mock.base_url)
+        monkeypatch.setattr(extract_api, "API_KEY", None)
+        monkeypatch.setattr(extract_api, "RATE_LIMIT", 1000)
+        players, games = extract_api.run_api(incremental=True)
+        assert len(players) == 150
+        assert len(games) == 200 and {g["season"] for g in games} == {2023}
+
+        # 202 matchs 2023: la première passe est tronquée, la seconde reprend au curseur de page
+        state = json.loads((tmp_path / "data" / "raw" / "extract_state.json").read_text())
+        assert state["games"]["2023"]["cursor"]["next_page"] == 3 and "last_date" not in state["games"]["2023"]
+        _, rest = extract_api.run_api(incremental=True)
+        assert len(rest) == 2
+
+        # plage complète: start_date = dernier jour vu, seuls ces matchs sont relus
+        _, games_again = extract_api.run_api(incremental=True)
+    state = json.loads((tmp_path / "data" / "raw" / "extract_state.json").read_text())
+    last_date = state["games"]["2023"]["last_date"]
+    assert "cursor" not in state["games"]["2023"]
+    assert games_again and all(g["date"] >= last_date for g in games_again)
+
+
+def _raw_games(tmp_path):
+    from raw_store import iter_jsonl, raw_path
+    return {g["id"] for g in iter_jsonl(str(tmp_path / raw_path("api_games", "data/raw")))}
+
+
+def test_incremental_games_reach_every_date(tmp_path, monkeypatch):
+    """Pages non triées par date: le repère n'avance pas tant que la plage n'est pas lue en entier."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    with MockBalldontlie(players=0, games=6000) as mock:
+        expected = {g["id"] for g in mock.data["games"] if g["season"] == 2023}
+        monkeypatch.setattr(extract_api, "BASE_URL", mock.base_url)
+        monkeypatch.setattr(extract_api, "API_KEY", None)
+        monkeypatch.setattr(extract_api, "RATE_LIMIT", 1000)
+        for _ in range(15):
+            extract_api.fetch_games(season=2023, per_page=100, max_games=200)
+            state = json.loads((tmp_path / "data" / "raw" / "extract_state.json").read_text())
+            if "cursor" not in state["games"]["2023"]:
+                break
+    assert _raw_games(tmp_path) == expected
+    assert state["games"]["2023"]["last_date"] == max(g["date"] for g in mock.data["games"] if g["season"] == 2023)
+
+
+def test_scheduled_games_do_not_advance_mark(tmp_path, monkeypatch):
+    """Matchs à venir (0-0, pas "Final"): le repère s'arrête avant eux et leurs scores sont relus."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    scheduled_from = "2024-03-15"
+
+    def fetch_until_complete():
+        for _ in range(15):
+            extract_api.fetch_games(season=2023, per_page=100, max_games=200)
+            state = json.loads((tmp_path / "data" / "raw" / "extract_state.json").read_text())
+            if "cursor" not in state["games"]["2023"]:
+                return state["games"]["2023"]
+        raise AssertionError("cursor never cleared")
+
+    with MockBalldontlie(players=0, games=6000, scheduled_from=scheduled_from) as mock:
+        monkeypatch.setattr(extract_api, "BASE_URL", mock.base_url)
+        monkeypatch.setattr(extract_api, "API_KEY", None)
+        monkeypatch.setattr(extract_api, "RATE_LIMIT", 1000)
+        mark = fetch_until_complete()
+        assert mark["last_date"] <= scheduled_from
+
+        # les matchs se jouent: l'API renvoie désormais les scores finaux
+        for g in mock.data["games"]:
+            if g["status"] != "Final":
+                g.update(status="Final", period=4, time="Final", home_team_score=101, visitor_team_score=99)
+        played = {g["id"] for g in mock.data["games"] if g["season"] == 2023 and g["date"] >= scheduled_from}
+        mark = fetch_until_complete()
+
+    from raw_store import iter_jsonl, raw_path
+    raw = {g["id"]: g for g in iter_jsonl(str(tmp_path / raw_path("api_games", "data/raw")))}
+    assert played and all(raw[i]["status"] == "Final" and raw[i]["home_team_score"] == 101 for i in played)
+    assert mark["last_date"] == max(g["date"] for g in mock.data["games"] if g["season"] == 2023)
+
+
+def test_players_rescan_picks_up_changes(tmp_path, monkeypatch):
+    """Le curseur de /players n'avance que vers les nouveaux joueurs: un joueur modifié
+    n'est relu qu'au balayage complet (périodique ou après un changement de per_page)."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "raw").mkdir(parents=True)
+    state_path = tmp_path / "data" / "raw" / "extract_state.json"
+    with MockBalldontlie(players=150, games=0) as mock:
+        monkeypatch.setattr(extract_api, "BASE_URL", mock.base_url)
+        monkeypatch.setattr(extract_api, "API_KEY", None)
+        monkeypatch.setattr(extract_api, "RATE_LIMIT", 1000)
+        monkeypatch.setattr(extract_api, "PLAYERS_RESCAN_DAYS", 7)
+        extract_api.fetch_all_players(per_page=50, max_players=100)
+        extract_api.fetch_all_players(per_page=50, max_players=100)
+        state = json.loads(state_path.read_text())["players"]
+        assert state["next_page"] == 4 and state["full_scan_at"] == state["sweep_started"]
+
+        mock.data["players"][0]["position"] = "C-F"
+        assert extract_api.fetch_all_players(per_page=50, max_players=100) == []
+
+        # per_page différent: les pages sont décalées, on repart de la page 1
+        assert len(extract_api.fetch_all_players(per_page=75, max_players=100)) == 100
+        assert json.loads(state_path.read_text())["players"]["next_page"] == 2
+
+        mock.data["players"][1]["position"] = "G-F"
+        extract_api.fetch_all_players(per_page=75, max_players=100)
+        assert extract_api.fetch_all_players(per_page=75, max_players=100) == []
+        # balayage complet trop ancien
+        full = json.loads(state_path.read_text())
+        full["players"]["sweep_started"] = full["players"]["full_scan_at"] = "2020-01-01"
+        state_path.write_text(json.dumps(full))
+        players = extract_api.fetch_all_players(per_page=75, max_players=100)
+    assert [p["id"] for p in players[:2]] == [1, 2] and players[1]["position"] == "G-F"
+    from raw_store import iter_jsonl, raw_path
+    raw = {p["id"]: p for p in iter_jsonl(str(tmp_path / raw_path("api_players", "data/raw")))}
+    assert len(raw) == 150 and raw[1]["position"] == "C-F" and raw[2]["position"] == "G-F"
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def test_estimate_count_binds_search_terms():
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL non définie dans .env")
+        return
+
+    from fastapi.testclient import TestClient
+    import main
+    from cache import get_response_cache
+
+    headers = {"X-API-Key": main.PUBLIC_API_KEY} if main.PUBLIC_API_KEY else {}
+    get_response_cache().invalidate()
+    with TestClient(main.app) as client:
+        # ":mot", quotes et % restent des valeurs: jamais interprétés comme SQL ou paramètres
+        for q in [":foo", "a :b", "O'Neal", "100%", "x'); DROP TABLE players; --"]:
+            r = client.get("/players", params={"q": q, "count": "estimate"}, headers=headers)
+            assert r.status_code == 200, (q, r.text)
+            assert isinstance(r.json()["total"], int)
+        r = client.get("/games", params={"season": 2023, "team_id": 1, "count": "estimate"}, headers=headers)
+        assert r.status_code == 200 and isinstance(r.json()["total"], int)
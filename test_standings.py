@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# équipes, matchs et saisons réservés au test (base de développement partagée)
+TEAMS = [990001, 990002, 990003]
+SEASONS = [1901, 1902]
+
+
+def _cleanup(sess):
+    sess.execute(text("DELETE FROM team_season_stats WHERE season = ANY(:s)"), {"s": SEASONS})
+    sess.execute(text("DELETE FROM games WHERE id >= 990000 AND id < 1000000"))
+    sess.execute(text("DELETE FROM seasons WHERE year = ANY(:s)"), {"s": SEASONS})
+    sess.execute(text("DELETE FROM teams WHERE id = ANY(:t)"), {"t": TEAMS})
+    sess.commit()
+
+
+def _games(rows):
+    import pyarrow as pa
+    names = ["id", "season", "date", "home_team_id", "visitor_team_id", "home_score", "visitor_score"]
+    return pa.Table.from_pylist([dict(zip(names, r)) for r in rows])
+
+
+def test_standings_refresh_only_touched_seasons(monkeypatch):
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL non définie dans .env")
+        return
+
+    import pyarrow as pa
+    from fastapi.testclient import TestClient
+    import load_pg
+    import main
+    from models import SessionLocal, TeamSeasonStat, init_db
+
+    init_db()
+    refreshed = []
+    refresh = load_pg.refresh_team_season_stats
+    monkeypatch.setattr(load_pg, "refresh_team_season_stats", lambda conn, seasons: refreshed.append(set(seasons)) or refresh(conn, seasons))
+
+    teams = pa.Table.from_pylist([{"id": t, "abbr": f"T{i}", "name": f"Team {i}"} for i, t in enumerate(TEAMS)])
+    games = _games([
+        (990001, 1901, None, 990001, 990002, 100, 90),
+        (990002, 1901, None, 990002, 990001, 80, 95),
+        (990003, 1901, None, 990003, 990001, 110, 105),
+        (990004, 1901, None, 990001, 990003, 0, 0),  # pas encore joué: ignoré
+    ])
+    with SessionLocal() as sess:
+        _cleanup(sess)
+    try:
+        load_pg.load_postgres(games=games, teams=teams)
+        assert refreshed[-1] == {1901}
+        with SessionLocal() as sess:
+            stats = {s.team_id: s for s in sess.query(TeamSeasonStat).filter(TeamSeasonStat.season == 1901)}
+        first = stats[990001]
+        assert (first.games, first.wins, first.losses) == (3, 2, 1)
+        assert (first.home_wins, first.home_losses, first.away_wins, first.away_losses) == (1, 0, 1, 1)
+        assert (first.points_for, first.points_against) == (100 + 95 + 105, 90 + 80 + 110)
+
+        # rechargement identique: aucune saison à recalculer
+        load_pg.load_postgres(games=games, teams=teams)
+        assert refreshed[-1] == set()
+
+        # un match change de saison: l'ancienne et la nouvelle sont recalculées
+        load_pg.load_postgres(games=_games([(990003, 1902, None, 990003, 990001, 110, 105)]), teams=teams)
+        assert refreshed[-1] == {1901, 1902}
+
+        headers = {"X-API-Key": main.PUBLIC_API_KEY} if main.PUBLIC_API_KEY else {}
+        with TestClient(main.app) as client:
+            standings = client.get("/standings?season=1901", headers=headers).json()
+            assert [(r["team_id"], r["wins"], r["losses"]) for r in standings["items"]] == \
+                [(990001, 2, 0), (990002, 0, 2)]
+            summary = client.get("/teams/990001/summary", headers=headers).json()
+            assert [s["season"] for s in summary["seasons"]] == [1902, 1901]
+            assert summary["totals"]["wins"] == 2 and summary["totals"]["losses"] == 1
+            assert client.get("/teams/990009/summary", headers=headers).status_code == 404
+    finally:
+        with SessionLocal() as sess:
+            _cleanup(sess)
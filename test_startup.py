@@ -0,0 +1,43 @@
+# test_startup.py
+import os
+import sys
+import subprocess
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+# budget d'import de main.py (µs cumulés selon -X importtime), ajustable sur une machine lente
+IMPORT_BUDGET_US = int(os.getenv("API_IMPORT_BUDGET_MS", "2500")) * 1000
+# modules du pipeline: chargés dans le processus du job, jamais par un worker de l'API
+ETL_ONLY = {"pandas", "pyarrow", "lxml", "requests", "pymongo", "psycopg", "extract_api", "extract_web",
+            "transform", "load_pg", "load_mongo", "pipeline"}
+
+
+def import_times(module, cwd):
+    """{module: µs cumulés} pour `import module` dans un interpréteur neuf, sans base ni clés."""
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("DATABASE_URL", "MONGO_URI", "MONGODB_URI", "BALLDONTLIE_API_KEY")}
+    env["PYTHONPATH"] = REPO
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_api_import_is_lazy_and_within_budget(tmp_path):
+    times = import_times("main", tmp_path)
+    assert not ETL_ONLY & set(times), sorted(ETL_ONLY & set(times))
+    assert times["main"] < IMPORT_BUDGET_US, f"import main: {times['main'] / 1000:.0f} ms"
+
+
+def test_api_import_opens_no_cache_file(tmp_path):
+    # CACHE_BACKEND=sqlite: le fichier n'est créé qu'au premier usage du cache
+    env = dict(os.environ, PYTHONPATH=REPO, CACHE_BACKEND="sqlite", CACHE_PATH="cache.sqlite3")
+    code = "import main, cache; import os; assert not os.path.exists('cache.sqlite3'); cache.get_response_cache()"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert (tmp_path / "cache.sqlite3").exists()
@@ -0,0 +1,101 @@
+# test_transform.py
+import datetime
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import extract_api
+import raw_store
+import transform
+from fake_data import fake_games, fake_players
+from raw_store import append_jsonl, iter_jsonl, raw_path
+
+
+def _write_raw(tmp_path, monkeypatch, players, games):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/raw", exist_ok=True)
+    append_jsonl(raw_path("api_players"), players)
+    append_jsonl(raw_path("api_games"), games)
+
+
+def test_first_seen_across_chunks_with_null_ids():
+    players = [
+        {"id": 3, "first_name": "a"},
+        {"id": None, "first_name": "sans id"},
+        {"id": 1, "first_name": "b"},
+        {"id": 3, "first_name": "doublon dans le bloc"},
+        # blocs suivants (chunk_size=4)
+        {"id": 1, "first_name": "doublon d'un bloc précédent"},
+        {"id": None, "first_name": "sans id"},
+        {"id": 2, "first_name": "c"},
+        {"id": 2, "first_name": "doublon"},
+        {"id": 7, "first_name": "d"},
+    ]
+    out = [t for kind, t in transform.transform_records(players=players, chunk_size=4) if kind == "players"]
+    rows = pa.concat_tables(out).to_pylist()
+    assert [(r["id"], r["first"]) for r in rows] == [(3, "a"), (1, "b"), (2, "c"), (7, "d")]
+
+    # même résultat en un seul bloc
+    single = [t for kind, t in transform.transform_records(players=players, chunk_size=100) if kind == "players"]
+    assert pa.concat_tables(single).to_pylist() == rows
+
+
+def test_curated_types(tmp_path, monkeypatch):
+    _write_raw(tmp_path, monkeypatch, fake_players(300, seed=1), fake_games(300, seed=1))
+    transform.run_transform()
+
+    players = pq.read_table("data/curated/players.parquet")
+    assert players.schema.field("id").type == pa.int32()
+    assert players.schema.field("team_id").type == pa.int32()
+    assert players.schema.field("pos").type == pa.dictionary(pa.int8(), pa.string())
+    games = transform.read_curated("games")
+    assert games.schema.field("date").type == pa.date32()
+    assert games.schema.field("home_score").type == pa.int16()
+    assert games.schema.field("visitor_score").type == pa.int16()
+    assert games.schema.field("season").type == pa.int32()
+    assert isinstance(games.column("date")[0].as_py(), datetime.date)
+
+
+def test_merge_snapshot_gzip_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_store, "RAW_COMPRESSION", "gzip")
+    players = list(fake_players(50, seed=2))
+    _write_raw(tmp_path, monkeypatch, players, [])
+    assert raw_path("api_players") == "data/raw/api_players.jsonl.gz"
+
+    changed = dict(players[4], position="C")
+    delta = "data/raw/api_players.delta.jsonl"
+    append_jsonl(delta, [changed, {"id": 51, "first_name": "Nouveau", "last_name": "Joueur"}])
+    path, merged = extract_api._merge_snapshot("api_players", delta)
+
+    assert path.endswith(".jsonl.gz") and not os.path.exists(delta)
+    assert [p["id"] for p in merged] == [5, 51]
+    raw = {p["id"]: p for p in iter_jsonl(path)}
+    assert len(raw) == 51 and raw[5] == changed and raw[1] == players[0]
+    # le transform lit directement le .gz
+    ids = pa.concat_tables(transform.iter_normalized(path, transform.normalize_players, transform.RAW_PLAYER_SCHEMA))
+    assert sorted(ids.column("id").to_pylist()) == list(range(1, 52))
+
+
+def test_game_partitions_and_null_season(tmp_path, monkeypatch):
+    games = list(fake_games(200, seed=3))
+    games[0]["season"] = None
+    _write_raw(tmp_path, monkeypatch, [], games)
+    transform.run_transform()
+
+    assert sorted(os.listdir("data/curated/games")) == ["season=-1", "season=2021", "season=2022", "season=2023"]
+    part = pq.read_table("data/curated/games/season=2023/part-0.parquet")
+    # la saison n'est portée que par le répertoire
+    assert part.schema == transform.GAME_SCHEMA
+    assert part.num_rows == sum(g["season"] == 2023 for g in games)
+
+    in_2023 = transform.read_curated("games", ["id"], ds.field("season") == 2023)
+    assert sorted(in_2023.column("id").to_pylist()) == sorted(g["id"] for g in games if g["season"] == 2023)
+
+    # season=-1/ est relu comme NULL
+    batches = list(transform.iter_curated("games", ["id", "season"], batch_size=50))
+    assert all(b.num_rows <= 50 for b in batches)
+    seasons = {r["id"]: r["season"] for b in batches for r in b.to_pylist()}
+    assert len(seasons) == 200 and seasons[games[0]["id"]] is None
+    assert seasons == {g["id"]: g["season"] for g in games}
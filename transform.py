@@ -1,54 +1,309 @@
 import os
+import shutil
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.json as pj
+import pyarrow.parquet as pq
 
-def run_transform():
+from metrics import ROWS, BYTES_WRITTEN
+from raw_store import raw_path, iter_chunks
+
+# taille des blocs lus dans le JSONL brut (octets) et des batches relus depuis la couche curated (lignes)
+BLOCK_SIZE = int(os.getenv("TRANSFORM_BLOCK_SIZE", str(4 << 20)))
+CHUNK_SIZE = int(os.getenv("TRANSFORM_CHUNK_SIZE", "10000"))
+CURATED_DIR = "data/curated"
+
+# schémas typés de la couche curated (Parquet)
+TEAM_SCHEMA = pa.schema([
+    ("id", pa.int32()),
+    ("abbr", pa.string()),
+    ("name", pa.string()),
+])
+PLAYER_SCHEMA = pa.schema([
+    ("id", pa.int32()),
+    ("first", pa.string()),
+    ("last", pa.string()),
+    ("pos", pa.dictionary(pa.int8(), pa.string())),
+    ("team_id", pa.int32()),
+])
+GAME_SCHEMA = pa.schema([
+    ("id", pa.int32()),
+    ("date", pa.date32()),
+    ("home_team_id", pa.int32()),
+    ("visitor_team_id", pa.int32()),
+    ("home_score", pa.int16()),
+    ("visitor_score", pa.int16()),
+])
+# les matchs sont partitionnés par saison (season=YYYY/)
+SEASON_PARTITIONING = ds.partitioning(pa.schema([("season", pa.int32())]), flavor="hive")
+
+# schémas déclarés du JSON brut: seuls ces champs sont lus, le reste est ignoré
+RAW_TEAM = pa.struct([("id", pa.int64()), ("abbreviation", pa.string()), ("full_name", pa.string())])
+RAW_PLAYER_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("first_name", pa.string()),
+    ("last_name", pa.string()),
+    ("position", pa.string()),
+    ("team", RAW_TEAM),
+])
+RAW_GAME_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("season", pa.int64()),
+    ("date", pa.string()),
+    ("home_team", RAW_TEAM),
+    ("visitor_team", RAW_TEAM),
+    ("home_team_score", pa.int64()),
+    ("visitor_team_score", pa.int64()),
+])
+
+# colonne de sortie -> chemin dans le JSON brut
+PLAYER_FIELDS = {
+    "id": "id",
+    "first": "first_name",
+    "last": "last_name",
+    "pos": "position",
+    "team_id": "team.id",
+}
+GAME_FIELDS = {
+    "id": "id",
+    "season": "season",
+    "date": "date",
+    "home_team_id": "home_team.id",
+    "visitor_team_id": "visitor_team.id",
+    "home_score": "home_team_score",
+    "visitor_score": "visitor_team_score",
+}
+
+
+def _column(batch, path):
+    names = path.split(".")
+    col = batch.column(names[0])
+    for name in names[1:]:
+        col = pc.struct_field(col, [name])
+    return col
+
+
+def _coerce(col, target):
+    if pa.types.is_date(target) and pa.types.is_string(col.type):
+        # "2023-10-24" ou "2023-10-24T00:00:00.000Z"
+        col = pc.utf8_slice_codeunits(col, 0, 10)
+    if pa.types.is_dictionary(target):
+        return col.cast(target.value_type).dictionary_encode().cast(target)
+    return col.cast(target)
+
+
+def normalize(batch, fields, schema, raw_schema, fill=None):
+    """Aplatit, renomme et type un bloc Arrow (ou une liste de dicts) en une passe colonne par colonne."""
+    if isinstance(batch, list):
+        batch = pa.RecordBatch.from_pylist(batch, schema=raw_schema)
+    arrays = []
+    for field in schema:
+        col = _column(batch, fields[field.name])
+        if fill and field.name in fill:
+            col = pc.fill_null(col, fill[field.name])
+        arrays.append(_coerce(col, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def normalize_players(batch):
+    # team_id reste NULL sans équipe (Arrow est nullable, et -1 casserait la FK teams)
+    return normalize(batch, PLAYER_FIELDS, PLAYER_SCHEMA, RAW_PLAYER_SCHEMA)
+
+
+def normalize_games(batch):
+    return normalize(batch, GAME_FIELDS, GAME_SCHEMA.append(pa.field("season", pa.int32())), RAW_GAME_SCHEMA)
+
+
+def normalize_teams(batch, prefixes, raw_schema):
+    """Extrait les équipes imbriquées (team, home_team, visitor_team) d'un bloc brut."""
+    if isinstance(batch, list):
+        batch = pa.RecordBatch.from_pylist(batch, schema=raw_schema)
+    tables = [
+        normalize(batch, {"id": f"{p}.id", "abbr": f"{p}.abbreviation", "name": f"{p}.full_name"},
+                  TEAM_SCHEMA, raw_schema, fill={"abbr": "", "name": ""})
+        for p in prefixes
+    ]
+    teams = pa.concat_tables(tables)
+    return teams.filter(pc.is_valid(teams.column("id")))
+
+
+class _SeenIds:
+    """Ids déjà émis, gardés dans un tableau NumPy trié (recherche vectorisée, sans set Python)."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+
+
+def _first_seen(table, seen):
+    """Masque les ids déjà vus (dans ce bloc ou les précédents): la première occurrence gagne.
+
+    Les lignes sans id sont écartées (pas de clé primaire possible en base).
+    """
+    if table.column("id").null_count:
+        # to_numpy donnerait des NaN, castés en entiers quelconques dans seen.ids
+        table = table.filter(pc.is_valid(table.column("id")))
+    ids = table.column("id").to_numpy(zero_copy_only=False).astype(np.int64, copy=False)
+    # ids distincts du bloc (triés) et index de leur première occurrence
+    uniq, first = np.unique(ids, return_index=True)
+    pos = np.searchsorted(seen.ids, uniq)
+    new = pos == len(seen.ids)
+    new[~new] = seen.ids[pos[~new]] != uniq[~new]
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[first[new]] = True
+    seen.ids = np.insert(seen.ids, pos[new], uniq[new])
+    return table.filter(pa.array(mask))
+
+
+def iter_raw_batches(path, raw_schema, block_size=BLOCK_SIZE):
+    """Lit le JSONL brut (éventuellement .gz) par blocs avec un schéma explicite, sans passer par des dicts Python."""
+    with pa.input_stream(path) as stream:
+        if not stream.read(1):
+            # open_json refuse un flux vide (ex: extraction sans aucune ligne)
+            return
+    reader = pj.open_json(
+        pa.input_stream(path),
+        read_options=pj.ReadOptions(block_size=block_size),
+        parse_options=pj.ParseOptions(explicit_schema=raw_schema, unexpected_field_behavior="ignore"),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch
+
+
+def iter_normalized(path, normalize, raw_schema, block_size=BLOCK_SIZE):
+    """Produit des tables normalisées et dédupliquées (on garde la première occurrence d'un id)."""
+    seen = _SeenIds()
+    for batch in iter_raw_batches(path, raw_schema, block_size):
+        yield _first_seen(normalize(batch), seen)
+
+
+def _transform_stream(player_batches, game_batches):
+    seen = {"teams": _SeenIds(), "players": _SeenIds(), "games": _SeenIds()}
+    sources = [
+        ("players", player_batches, normalize_players, RAW_PLAYER_SCHEMA, ["team"]),
+        ("games", game_batches, normalize_games, RAW_GAME_SCHEMA, ["home_team", "visitor_team"]),
+    ]
+    for kind, batches, normalize_fn, raw_schema, team_prefixes in sources:
+        for batch in batches:
+            ROWS.inc(batch.num_rows, step="transform", kind=kind, direction="in")
+            teams = _first_seen(normalize_teams(batch, team_prefixes, raw_schema), seen["teams"])
+            if teams.num_rows:
+                yield "teams", teams
+            yield kind, _first_seen(normalize_fn(batch), seen[kind])
+
+
+def iter_transformed(players_path, games_path, block_size=BLOCK_SIZE):
+    """Flux ("teams" | "players" | "games", table) depuis le JSONL brut, dans l'ordre des clés étrangères."""
+    yield from _transform_stream(
+        iter_raw_batches(players_path, RAW_PLAYER_SCHEMA, block_size),
+        iter_raw_batches(games_path, RAW_GAME_SCHEMA, block_size),
+    )
+
+
+def transform_records(players=(), games=(), chunk_size=CHUNK_SIZE):
+    """Même flux que iter_transformed, pour des listes de dicts bruts de l'API."""
+    yield from _transform_stream(
+        (pa.RecordBatch.from_pylist(c, schema=RAW_PLAYER_SCHEMA) for c in iter_chunks(players, chunk_size)),
+        (pa.RecordBatch.from_pylist(c, schema=RAW_GAME_SCHEMA) for c in iter_chunks(games, chunk_size)),
+    )
+
+
+class _GameWriter:
+    """Écrit les matchs dans un fichier Parquet par saison (season=YYYY/)."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.writers = {}
+
+    def write_table(self, table):
+        seasons = pc.fill_null(table.column("season"), -1)
+        body = table.drop_columns(["season"])
+        for season in pc.unique(seasons).to_pylist():
+            if season not in self.writers:
+                season_dir = os.path.join(self.out_dir, f"season={season}")
+                os.makedirs(season_dir, exist_ok=True)
+                self.writers[season] = pq.ParquetWriter(os.path.join(season_dir, "part-0.parquet"), GAME_SCHEMA)
+            self.writers[season].write_table(body.filter(pc.equal(seasons, season)))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def as_tables(data):
+    """pa.Table / RecordBatch / DataFrame, ou itérable de ces blocs -> tables Arrow."""
+    if data is None:
+        return
+    if isinstance(data, pa.RecordBatch):
+        yield pa.Table.from_batches([data])
+    elif isinstance(data, pa.Table):
+        yield data
+    elif isinstance(data, pd.DataFrame):
+        yield pa.Table.from_pandas(data, preserve_index=False)
+    else:
+        for item in data:
+            yield from as_tables(item)
+
+
+def curated_dataset(name, curated_dir=CURATED_DIR):
+    """Dataset Arrow ("teams", "players" ou "games") de la couche curated."""
+    if name == "games":
+        return ds.dataset(os.path.join(curated_dir, "games"), format="parquet", partitioning=SEASON_PARTITIONING)
+    return ds.dataset(os.path.join(curated_dir, f"{name}.parquet"), format="parquet")
+
+
+def read_curated(name, columns=None, filter=None, curated_dir=CURATED_DIR):
+    """Lit seulement les colonnes demandées, ex: read_curated("games", ["id", "date"], ds.field("season") == 2023)."""
+    return curated_dataset(name, curated_dir).to_table(columns=columns, filter=filter)
+
+
+def iter_curated(name, columns=None, filter=None, batch_size=CHUNK_SIZE, curated_dir=CURATED_DIR):
+    """Itère la couche curated par RecordBatch bornés."""
+    dataset = curated_dataset(name, curated_dir)
+    for batch in dataset.to_batches(columns=columns, filter=filter, batch_size=batch_size):
+        if "season" in batch.schema.names:
+            # season=-1/ contient les matchs sans saison
+            index = batch.schema.get_field_index("season")
+            season = batch.column(index)
+            batch = batch.set_column(index, "season", pc.if_else(pc.equal(season, -1), pa.scalar(None, season.type), season))
+        yield batch
+
+
+def run_transform(sink=None):
+    """Écrit la couche curated; `sink(kind, table)` reçoit chaque bloc au fil de l'eau (ex: chargement en base)."""
     os.makedirs("data/raw", exist_ok=True)
-    players_path = "data/raw/api_players.json"
-    games_path = "data/raw/api_games.json"
+    players_path = raw_path("api_players")
+    games_path = raw_path("api_games")
 
     if not (os.path.exists(players_path) and os.path.exists(games_path)):
         print("⚠️ Transform skipped: raw API files not found.")
         return
 
-   
-    players = pd.read_json(players_path)
-    games = pd.read_json(games_path)
-
-    
-    players_norm = pd.json_normalize(players.to_dict(orient="records"))
-    games_norm = pd.json_normalize(games.to_dict(orient="records"))
-
-  
-    if "team.id" in players_norm.columns:
-        players_norm["team.id"] = players_norm["team.id"].fillna(-1).astype(int)
-
-     
-    if "id" in players_norm.columns:
-        players_norm = players_norm.drop_duplicates(subset=["id"])
-    if "id" in games_norm.columns:
-        games_norm = games_norm.drop_duplicates(subset=["id"])
-
-   
-    players_out = players_norm.rename(columns={
-        "first_name": "first",
-        "last_name": "last",
-        "position": "pos",
-        "team.id": "team_id"
-    })
-    keep_players = [c for c in ["id", "first", "last", "pos", "team_id"] if c in players_out.columns]
-    players_out = players_out[keep_players]
-
-    games_out = games_norm.rename(columns={
-        "home_team.id": "home_team_id",
-        "visitor_team.id": "visitor_team_id",
-        "home_team_score": "home_score",
-        "visitor_team_score": "visitor_score"
-    })
-    keep_games = [c for c in ["id", "season", "date", "home_team_id", "visitor_team_id", "home_score", "visitor_score"] if c in games_out.columns]
-    games_out = games_out[keep_games]
-
-    
-    players_out.to_csv("data/raw/players_norm.csv", index=False)
-    games_out.to_csv("data/raw/games_norm.csv", index=False)
-
-    print("✅ Transform complete: wrote players_norm.csv and games_norm.csv")
\ No newline at end of file
+    os.makedirs(CURATED_DIR, exist_ok=True)
+    games_dir = os.path.join(CURATED_DIR, "games")
+    shutil.rmtree(games_dir, ignore_errors=True)
+
+    writers = {
+        "teams": pq.ParquetWriter(os.path.join(CURATED_DIR, "teams.parquet"), TEAM_SCHEMA),
+        "players": pq.ParquetWriter(os.path.join(CURATED_DIR, "players.parquet"), PLAYER_SCHEMA),
+        "games": _GameWriter(games_dir),
+    }
+    rows = dict.fromkeys(writers, 0)
+    try:
+        for kind, table in iter_transformed(players_path, games_path):
+            writers[kind].write_table(table)
+            rows[kind] += table.num_rows
+            ROWS.inc(table.num_rows, step="transform", kind=kind, direction="out")
+            if sink is not None:
+                sink(kind, table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    written = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(CURATED_DIR) for f in files)
+    BYTES_WRITTEN.inc(written, target="curated")
+
+    print(f"✅ Transform complete: wrote {rows['teams']} teams, {rows['players']} players and {rows['games']} games to {CURATED_DIR}")
+    return rows